@@ -0,0 +1,312 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from reviews.versions import resource_version
+
+CACHE_HEADER = 'X-Cache'
+# Повторы фонового пересчета, если БД заблокирована записью.
+REFRESH_ATTEMPTS = 3
+REFRESH_RETRY_DELAY = 0.5
+
+refresh_executor = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix='response-refresh'
+)
+
+
+def not_modified(request, etag, last_modified):
+    """304 с теми же валидаторами, если они совпали с заголовками
+    If-None-Match или If-Modified-Since, иначе None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+
+class SingleFlight:
+    """Один пересчет на ключ кэша, сколько бы запросов за ним ни пришло.
+
+    Пересчитывает тот, кто первым создал файл блокировки рядом с
+    файлами версий: open с O_CREAT | O_EXCL атомарен, поэтому запросы
+    объединяются и между процессами сервера, какой бы кэш ответов ни
+    был настроен. Остальные получают устаревшую запись, если она есть,
+    или ждут новую не дольше wait_timeout секунд, после чего считают
+    ответ сами. Блокировка старше lock_timeout секунд считается
+    оставшейся от упавшего процесса и снимается.
+    """
+
+    def __init__(self, wait_timeout=2, lock_timeout=30, poll_interval=0.01):
+        self.wait_timeout = wait_timeout
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.counters_lock = threading.Lock()
+        self.counters = Counter()
+
+    def lock_path(self, key):
+        return os.path.join(
+            settings.VERSION_FILES_DIR, f'lock-{key.replace(":", "-")}'
+        )
+
+    def acquire(self, key):
+        os.makedirs(settings.VERSION_FILES_DIR, exist_ok=True)
+        path = self.lock_path(key)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                if self.is_locked(key):
+                    return False
+                self.release(key)
+        return False
+
+    def release(self, key):
+        try:
+            os.remove(self.lock_path(key))
+        except FileNotFoundError:
+            pass
+
+    def is_locked(self, key):
+        try:
+            created = os.stat(self.lock_path(key)).st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - created <= self.lock_timeout
+
+    def wait(self, cache, key, version):
+        """Новая запись или None, если ее не дождались или
+        пересчет закончился ответом, который не кэшируется."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = cache.get(key)
+            if entry is not None and entry['version'] == version:
+                return entry
+            if not self.is_locked(key):
+                return None
+        return None
+
+    def count(self, name):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+
+# Общий экземпляр, чтобы счетчики считались по всем вьюсетам.
+single_flight = SingleFlight()
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для действий conditional_actions по версиям
+    ресурсов из атрибута resources.
+
+    Проверка идет после аутентификации и прав доступа, но до
+    обработчика, а версии читаются из файлов без обращения к БД,
+    поэтому на совпавший If-None-Match или If-Modified-Since вьюсет
+    отвечает 304, не выполняя ни основной запрос, ни сериализацию.
+    """
+    conditional_actions = ('list', 'retrieve')
+    resources = ()
+
+    def get_validators(self, request):
+        versions = resource_version(self.resources)
+        accept = request.META.get('HTTP_ACCEPT', '')
+        etag = quote_etag(hashlib.md5(
+            f'{versions}|{accept}'.encode('utf8')
+        ).hexdigest())
+        mtimes = [version[1] for version in versions if version is not None]
+        last_modified = max(mtimes) // 10 ** 9 if mtimes else None
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None
+        if request.method == 'GET' and (
+            self.action in self.conditional_actions
+        ):
+            self.conditional_validators = self.get_validators(request)
+            response = not_modified(request, *self.conditional_validators)
+            if response is not None:
+                raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, 'conditional_validators', None)
+        if validators is not None and response.status_code == 200:
+            set_validators(response, *validators)
+        return response
+
+
+class CachedResponseMixin:
+    """Кэш ответов вьюсета на GET-запросы без токена.
+
+    Ключ - хост, путь со строкой запроса и заголовок Accept. Запись
+    хранит версии ресурсов resources, с которыми она построена,
+    и считается действительной, пока версии не поменялись, так что
+    сигналы об изменении данных сбрасывают ее точно, без TTL.
+    Хранилище - кэш RESPONSE_CACHE_ALIAS из settings.CACHES.
+
+    Если задан single_flight, промах пересчитывает один запрос,
+    а одновременные с ним ждут результат или получают старую запись.
+    Если для basename вьюсета задан возраст в settings.MAX_STALE_AGE,
+    пересчет идет в фоне: когда БД занята или отвечает дольше
+    STALE_REFRESH_TIMEOUT, клиент получает старую запись не старше
+    этого возраста, а фоновый пересчет сохранит новую.
+    """
+    cached_actions = ('list', 'retrieve')
+    resources = ()
+    single_flight = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        key = self.get_cache_key(request)
+        version = resource_version(self.resources)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return self.response_from_entry(request, entry, 'HIT')
+        if self.single_flight is None:
+            return self.refresh(cache, key, version, request, *args, **kwargs)
+        if self.single_flight.acquire(key):
+            return self.lead(cache, key, version, entry, request,
+                             *args, **kwargs)
+        if entry is not None and self.is_servable(entry):
+            self.single_flight.count('stale_served')
+            return self.response_from_entry(request, entry, 'STALE')
+        entry = self.single_flight.wait(cache, key, version)
+        if entry is not None:
+            self.single_flight.count('coalesced')
+            return self.response_from_entry(request, entry, 'COALESCED')
+        return self.refresh(cache, key, version, request, *args, **kwargs)
+
+    def lead(self, cache, key, version, entry, request, *args, **kwargs):
+        """Пересчет под блокировкой single_flight."""
+        if entry is None or self.get_max_stale_age() is None or (
+            not self.is_servable(entry)
+        ):
+            try:
+                return self.refresh(
+                    cache, key, version, request, *args, **kwargs
+                )
+            finally:
+                self.single_flight.release(key)
+        future = refresh_executor.submit(
+            self.refresh_in_background, cache, key, version, request,
+            *args, **kwargs
+        )
+        try:
+            return future.result(timeout=settings.STALE_REFRESH_TIMEOUT)
+        except (FutureTimeoutError, OperationalError):
+            self.single_flight.count('stale_on_busy_db')
+            return self.response_from_entry(request, entry, 'STALE')
+
+    def refresh_in_background(self, cache, key, version, request, *args,
+                              **kwargs):
+        try:
+            for attempt in range(REFRESH_ATTEMPTS):
+                try:
+                    return self.refresh(
+                        cache, key, version, request, *args, **kwargs
+                    )
+                except OperationalError:
+                    # database is locked: ждем, пока запись закончится.
+                    if attempt == REFRESH_ATTEMPTS - 1:
+                        raise
+                    time.sleep(REFRESH_RETRY_DELAY)
+        finally:
+            self.single_flight.release(key)
+            connection.close()
+
+    def refresh(self, cache, key, version, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.render()
+            cache.set(key, {
+                'version': version,
+                'created': time.time(),
+                'status': response.status_code,
+                'content': response.content,
+                'headers': dict(response.items()),
+            }, timeout=None)
+        response[CACHE_HEADER] = 'MISS'
+        return response
+
+    def get_max_stale_age(self):
+        return settings.MAX_STALE_AGE.get(self.basename)
+
+    def is_servable(self, entry):
+        """Можно ли отдать запись устаревшей версии."""
+        max_age = self.get_max_stale_age()
+        return max_age is None or (
+            time.time() - entry.get('created', 0) <= max_age
+        )
+
+    def is_cacheable(self, request):
+        # Токен передается только в заголовке Authorization,
+        # поэтому запрос без него - анонимный.
+        return (
+            request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and self.action_map.get('get') in self.cached_actions
+        )
+
+    def get_cache_key(self, request):
+        accept = request.META.get('HTTP_ACCEPT', '')
+        digest = hashlib.md5(
+            f'{request.get_host()}{request.get_full_path()}|{accept}'
+            .encode('utf8')
+        ).hexdigest()
+        return f'response:{digest}'
+
+    def response_from_entry(self, request, entry, state):
+        headers = entry['headers']
+        response = None
+        if 'ETag' in headers:
+            response = not_modified(
+                request, headers['ETag'],
+                parse_http_date_safe(headers.get('Last-Modified', ''))
+            )
+        if response is None:
+            response = HttpResponse(entry['content'], status=entry['status'])
+            for header, value in headers.items():
+                response[header] = value
+        response[CACHE_HEADER] = state
+        if state == 'STALE':
+            response['Age'] = int(time.time() - entry.get('created', 0))
+        return response
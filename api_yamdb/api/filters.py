@@ -1,17 +1,20 @@
 import django_filters
+from rest_framework.filters import BaseFilterBackend
 
-from reviews.models import Title
+from reviews.dictionaries import category_cache, genre_cache
+from reviews.models import (Comment, Review, Title, normalize_name,
+                            prefix_upper_bound)
 
 
 class TitleFilter(django_filters.FilterSet):
     category = django_filters.CharFilter(
-        field_name='category__slug'
+        method='filter_category'
     )
     genre = django_filters.CharFilter(
-        field_name='genre__slug'
+        method='filter_genre'
     )
     name = django_filters.CharFilter(
-        field_name='name', lookup_expr='istartswith'
+        method='filter_name_prefix'
     )
     year = django_filters.NumberFilter(
         field_name='year'
@@ -25,3 +28,86 @@ class TitleFilter(django_filters.FilterSet):
             'name',
             'year'
         )
+
+    def filter_category(self, queryset, name, value):
+        """slug переводится в id по кэшу справочника,
+        так что в запросе нет соединения с таблицей категорий."""
+        category = category_cache.get_by_slug(value)
+        if category is None:
+            return queryset.none()
+        return queryset.filter(category_id=category.pk)
+
+    def filter_genre(self, queryset, name, value):
+        genre = genre_cache.get_by_slug(value)
+        if genre is None:
+            return queryset.none()
+        return queryset.filter(genre=genre.pk)
+
+    def filter_name_prefix(self, queryset, name, value):
+        """Префикс по нормализованному названию как диапазон
+        [prefix, следующий за prefix), который SQLite отвечает
+        поиском по индексу name_key, а не LIKE по всей таблице."""
+        prefix = normalize_name(value)
+        if not prefix:
+            return queryset
+        queryset = queryset.filter(name_key__gte=prefix)
+        upper = prefix_upper_bound(prefix)
+        if upper is None:
+            return queryset
+        return queryset.filter(name_key__lt=upper)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск по индексу из атрибута search_index
+    вьюсета, результаты отсортированы по релевантности."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        return view.search_index.search(queryset, text)
+
+
+class PubDateRangeFilter(django_filters.FilterSet):
+    author = django_filters.CharFilter(
+        field_name='author__username'
+    )
+    date_from = django_filters.IsoDateTimeFilter(
+        field_name='pub_date', lookup_expr='gte'
+    )
+    date_to = django_filters.IsoDateTimeFilter(
+        field_name='pub_date', lookup_expr='lte'
+    )
+
+
+class ReviewSearchFilter(PubDateRangeFilter):
+    title = django_filters.NumberFilter(
+        field_name='title_id'
+    )
+
+    class Meta:
+        model = Review
+        fields = (
+            'title',
+            'author',
+            'date_from',
+            'date_to'
+        )
+
+
+class CommentSearchFilter(PubDateRangeFilter):
+    title = django_filters.NumberFilter(
+        field_name='review__title_id'
+    )
+    review = django_filters.NumberFilter(
+        field_name='review_id'
+    )
+
+    class Meta:
+        model = Comment
+        fields = (
+            'title',
+            'review',
+            'author',
+            'date_from',
+            'date_to'
+        )
@@ -0,0 +1,51 @@
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+
+
+class IdentityMap:
+    """Объекты, уже загруженные за время запроса, по модели и pk.
+
+    Повторный get() того же объекта возвращает тот же экземпляр без
+    запроса к БД, а attach() подставляет загруженные объекты в
+    внешние ключи, чтобы obj.author или obj.title не загружались
+    заново при проверке прав и сериализации.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def add(self, obj):
+        self.objects[type(obj), obj.pk] = obj
+        return obj
+
+    def get(self, queryset, pk):
+        model = queryset.model
+        try:
+            pk = model._meta.pk.to_python(pk)
+        except ValidationError:
+            pk = None
+        obj = self.objects.get((model, pk))
+        if obj is None:
+            obj = self.add(get_object_or_404(queryset, pk=pk))
+        return obj
+
+    def attach(self, obj, *fields):
+        for name in fields:
+            field = obj._meta.get_field(name)
+            related = self.objects.get((
+                field.related_model, getattr(obj, field.attname)
+            ))
+            if related is not None:
+                setattr(obj, name, related)
+        return obj
+
+
+def get_identity_map(request):
+    """Карта объектов запроса. Текущий пользователь попадает в нее
+    сразу, он уже загружен при аутентификации."""
+    identity_map = getattr(request, 'identity_map', None)
+    if identity_map is None:
+        identity_map = request.identity_map = IdentityMap()
+        if request.user.is_authenticated:
+            identity_map.add(request.user)
+    return identity_map
@@ -0,0 +1,260 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# LIMIT и OFFSET в SQLite - 64-битные целые со знаком.
+MAX_OFFSET = 2 ** 63 - 1
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу сортировки без COUNT(*) и OFFSET.
+
+    Курсор хранит значения полей ordering у крайней записи страницы,
+    следующая страница выбирается условием "после этих значений",
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Последним полем в ordering должен быть уникальный ключ.
+    """
+    ordering = ('-id',)
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        try:
+            if position is not None:
+                queryset = queryset.filter(self.seek(ordering, position))
+            results = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError, OverflowError):
+            # OverflowError - целое в курсоре не помещается в параметр БД.
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        self.next_position = (
+            self.get_position(results[-1]) if has_next and results else None
+        )
+        self.previous_position = (
+            self.get_position(results[0])
+            if has_previous and results else None
+        )
+        return results
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return self.ordering
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def seek(self, ordering, position):
+        """Строит условие (a, b) > (x, y) в виде
+        a > x OR (a = x AND b > y) с учетом направления полей."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_position(self, instance):
+        return [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        data = {
+            'p': [
+                value.isoformat() if isinstance(value, date) else value
+                for value in position
+            ],
+            'r': int(reverse),
+        }
+        encoded = urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode('utf8')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class PubDateKeysetPagination(KeysetPagination):
+    """Отзывы и комментарии: сначала новые."""
+    ordering = ('-pub_date', '-id')
+
+
+class CountFreePagination(BasePagination):
+    """Постраничный вывод по номеру страницы без COUNT(*).
+
+    Выбирается на одну запись больше размера страницы, наличие лишней
+    записи и означает, что есть следующая страница. С параметром
+    ?count=cached в ответ добавляется количество, закэшированное
+    на count_cache_timeout секунд, поэтому оно может отставать.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+    count_query_param = 'count'
+    count_cache_timeout = 60
+    invalid_page_message = 'Invalid page.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page - 1) * self.page_size
+        if self.page < 1 or offset + self.page_size + 1 > MAX_OFFSET:
+            raise NotFound(self.invalid_page_message)
+        results = list(queryset[offset:offset + self.page_size + 1])
+        if not results and self.page > 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(results) > self.page_size
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'cached':
+            self.count = self.get_cached_count(queryset)
+        return results[:self.page_size]
+
+    def get_cached_count(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        key = 'pagination-count:' + hashlib.md5(
+            f'{sql}{params}'.encode('utf8')
+        ).hexdigest()
+        return cache.get_or_set(
+            key, queryset.count, self.count_cache_timeout
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.page_query_param,
+            self.page + 1
+        )
+
+    def get_previous_link(self):
+        if self.page == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page - 1
+        )
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+
+class TitleKeysetPagination(KeysetPagination):
+    """Каталог по году выхода. В SQLite индекс year_idx хранит rowid,
+    поэтому он покрывает и (year, id)."""
+    ordering = ('year', 'id')
+
+
+class SelectablePagination(PageNumberPagination):
+    """Постраничный вывод по номеру страницы, который клиент может
+    заменить на другой режим параметром ?pagination=<режим>.
+
+    Ссылки next и previous сохраняют параметры запроса,
+    поэтому выбранный режим действует на всех страницах.
+    """
+    mode_query_param = 'pagination'
+    modes = {'nocount': CountFreePagination}
+
+    def get_delegate(self, request):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is None:
+            return None
+        if mode not in self.modes:
+            raise NotFound(f'Unknown pagination mode: {mode}')
+        return self.modes[mode]()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.delegate = self.get_delegate(request)
+        if self.delegate is None:
+            return super().paginate_queryset(queryset, request, view)
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.delegate is None:
+            return super().get_paginated_response(data)
+        return self.delegate.get_paginated_response(data)
+
+
+class TitlePagination(SelectablePagination):
+    modes = {
+        **SelectablePagination.modes,
+        'cursor': TitleKeysetPagination,
+    }
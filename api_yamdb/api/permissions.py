@@ -16,9 +16,17 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         )
 
 
+class IsModeratorOrAdmin(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return (request.user.is_authenticated
+                and (request.user.is_moderator
+                     or request.user.is_admin
+                     or request.user.is_superuser))
+
+
 class IsAuthorOrModerPlusOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return (request.method in permissions.SAFE_METHODS
-                or obj.author == request.user
+                or obj.author_id == request.user.id
                 or request.user.is_moderator
                 or request.user.is_admin)
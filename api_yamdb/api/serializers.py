@@ -1,15 +1,19 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db.models import Avg
-from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
+from reviews.dictionaries import category_cache, genre_cache
 from reviews.models import Category, Comment, Genre, Review, Title
-from api_yamdb.settings import MAX_EMAIL_LENGTH, MAX_USERNAME_LENGTH
+from api_yamdb.settings import (MAX_BATCH_IDS, MAX_EMAIL_LENGTH,
+                                MAX_USERNAME_LENGTH)
 
 User = get_user_model()
+# Первичные ключи - 64-битные целые со знаком, id вне этих границ
+# БД не принимает в параметрах запроса.
+MAX_ID = 2 ** 63 - 1
 
 
 class SignupSerializer(serializers.ModelSerializer):
@@ -83,29 +87,61 @@ class GenreSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
-class TitleBaseSerializer(serializers.ModelSerializer):
-    genre = GenreSerializer(many=True)
-    category = CategorySerializer()
-    rating = serializers.SerializerMethodField()
+class DictionarySlugField(serializers.SlugRelatedField):
+    """Поле для категории или жанра по slug, которое ищет запись
+    в кэше справочника вместо запроса к БД."""
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(
+            slug_field='slug', queryset=cache.model.objects.all(), **kwargs
+        )
 
-    def get_rating(self, obj):
-        avg = Review.objects.filter(title=obj.id).aggregate(Avg('score'))
-        return avg['score__avg']
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        obj = self.cache.get_by_slug(data)
+        if obj is None:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field,
+                value=smart_str(data)
+            )
+        return obj
+
+
+class TitleBaseSerializer(serializers.ModelSerializer):
+    """Жанры и категория берутся из кэша справочников по id,
+    от БД нужны только связи произведения с жанрами."""
+    genre = serializers.SerializerMethodField()
+    category = serializers.SerializerMethodField()
+    rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id', 'name', 'year', 'rating',
+            'description', 'genre', 'category'
+        )
+
+    def get_genre(self, obj):
+        genres = (
+            genre_cache.get_by_id(link.genre_id)
+            for link in obj.titlegenre_set.all()
+        )
+        return GenreSerializer(
+            [genre for genre in genres if genre is not None], many=True
+        ).data
+
+    def get_category(self, obj):
+        category = category_cache.get_by_id(obj.category_id)
+        if category is None:
+            return None
+        return CategorySerializer(category).data
 
 
 class TitlePostSerializer(serializers.ModelSerializer):
-    genre = serializers.SlugRelatedField(
-        many=True, slug_field='slug',
-        queryset=Genre.objects.all()
-    )
-    category = serializers.SlugRelatedField(
-        slug_field='slug',
-        queryset=Category.objects.all()
-    )
+    genre = DictionarySlugField(genre_cache, many=True)
+    category = DictionarySlugField(category_cache)
 
     class Meta:
         model = Title
@@ -127,6 +163,41 @@ class TitlePostSerializer(serializers.ModelSerializer):
         return value
 
 
+class TitleSuggestSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=256)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    order = serializers.ChoiceField(
+        choices=('rating', 'popularity'), default='rating'
+    )
+
+
+class TitleIdsSerializer(serializers.Serializer):
+    """Список положительных id через запятую, без повторов и не длиннее
+    MAX_BATCH_IDS, в порядке запроса."""
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(
+                int(item) for item in value.split(',') if item.strip()
+            ))
+        except ValueError:
+            raise serializers.ValidationError(
+                'Ожидаются целые числа через запятую.'
+            )
+        if not ids:
+            raise serializers.ValidationError('Не указано ни одного id.')
+        if not all(1 <= pk <= MAX_ID for pk in ids):
+            raise serializers.ValidationError(
+                f'id должны быть от 1 до {MAX_ID}.'
+            )
+        if len(ids) > MAX_BATCH_IDS:
+            raise serializers.ValidationError(
+                f'Не больше {MAX_BATCH_IDS} id за один запрос.'
+            )
+        return ids
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     """Серилизатор для отзывов."""
     author = serializers.SlugRelatedField(
@@ -142,8 +213,7 @@ class ReviewSerializer(serializers.ModelSerializer):
     def validate(self, data):
         request = self.context['request']
         author = request.user
-        title_id = self.context.get('view').kwargs.get('title_id')
-        title = get_object_or_404(Title, id=title_id)
+        title = self.context['view'].get_title()
         if (
                 request.method == 'POST'
                 and title.reviews.filter(author=author).exists()
@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    ReviewViewSet, TitleViewSet, UserViewSet, api_signup,
+from .views import (CategoryViewSet, CommentSearchViewSet, CommentViewSet,
+                    GenreViewSet, ReviewSearchViewSet, ReviewViewSet,
+                    TitleViewSet, UserViewSet, api_cache_stats, api_signup,
                     api_token)
 
 app_name = 'api'
@@ -23,9 +24,16 @@ router_v1.register('categories', CategoryViewSet, basename='categories')
 router_v1.register('genres', GenreViewSet, basename='genres')
 router_v1.register('titles', TitleViewSet, basename='titles')
 router_v1.register(r'users', UserViewSet, basename='users')
+router_v1.register(
+    'search/reviews', ReviewSearchViewSet, basename='search-reviews'
+)
+router_v1.register(
+    'search/comments', CommentSearchViewSet, basename='search-comments'
+)
 
 urlpatterns = [
     path('v1/auth/signup/', api_signup),
     path('v1/auth/token/', api_token),
+    path('v1/cache/stats/', api_cache_stats),
     path('v1/', include(router_v1.urls)),
 ]
@@ -1,26 +1,42 @@
+import hashlib
+import json
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action, api_view
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from reviews.models import Category, Genre, Review, Title
-from api_yamdb.settings import ADMIN_EMAIL
-from .filters import TitleFilter
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre)
+from reviews.versions import bump_resources
+from api_yamdb.settings import ADMIN_EMAIL, MAX_BULK_TITLES
+from search.fts import COMMENT_INDEX, REVIEW_INDEX, TITLE_INDEX
+from search.suggest import title_suggest_index
+from .cache import CachedResponseMixin, ConditionalGetMixin, single_flight
+from .filters import (CommentSearchFilter, FullTextSearchFilter,
+                      ReviewSearchFilter, TitleFilter)
+from .identity import get_identity_map
 from .mixins import ListCreateDeleteViewSet
+from .pagination import PubDateKeysetPagination, TitlePagination
 from .permissions import (IsAdminOrReadOnly, IsAdminOrSuperuser,
-                          IsAuthorOrModerPlusOrReadOnly)
+                          IsAuthorOrModerPlusOrReadOnly, IsModeratorOrAdmin)
 from .serializers import (CategorySerializer, CommentSerializer,
                           GenreSerializer, ReviewSerializer, SignupSerializer,
-                          TitleBaseSerializer, TitlePostSerializer,
-                          TokenSerializer, UserIsAdminSerializer,
-                          UserSerializer)
+                          TitleBaseSerializer, TitleIdsSerializer,
+                          TitlePostSerializer, TitleSuggestSerializer,
+                          TokenSerializer,
+                          UserIsAdminSerializer, UserSerializer)
 
 User = get_user_model()
 
@@ -98,6 +114,19 @@ def api_token(request):
                     status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes((IsAdminOrSuperuser,))
+def api_cache_stats(request):
+    """Счетчики кэша ответов этого процесса: сколько запросов дождались
+    чужого пересчета (coalesced), получили устаревший ответ во время
+    чужого пересчета (stale_served) и пока БД была занята
+    (stale_on_busy_db)."""
+    return Response({
+        'coalesced': 0, 'stale_served': 0, 'stale_on_busy_db': 0,
+        **single_flight.stats()
+    })
+
+
 class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserIsAdminSerializer
     queryset = User.objects.all()
@@ -136,7 +165,10 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CategoryViewSet(ListCreateDeleteViewSet):
+class CategoryViewSet(CachedResponseMixin, ConditionalGetMixin,
+                      ListCreateDeleteViewSet):
+    resources = ('categories',)
+    single_flight = single_flight
     queryset = Category.objects.get_queryset()
     serializer_class = CategorySerializer
     filter_backends = (filters.SearchFilter,)
@@ -145,7 +177,10 @@ class CategoryViewSet(ListCreateDeleteViewSet):
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class GenreViewSet(ListCreateDeleteViewSet):
+class GenreViewSet(CachedResponseMixin, ConditionalGetMixin,
+                   ListCreateDeleteViewSet):
+    resources = ('genres',)
+    single_flight = single_flight
     queryset = Genre.objects.get_queryset()
     serializer_class = GenreSerializer
     filter_backends = (filters.SearchFilter,)
@@ -154,10 +189,19 @@ class GenreViewSet(ListCreateDeleteViewSet):
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.all()
-    filter_backends = (DjangoFilterBackend,)
+class TitleViewSet(CachedResponseMixin, ConditionalGetMixin,
+                   viewsets.ModelViewSet):
+    resources = ('titles',)
+    single_flight = single_flight
+    queryset = Title.objects.prefetch_related(
+        Prefetch('titlegenre_set', queryset=TitleGenre.objects.only(
+            'title_id', 'genre_id'
+        ))
+    )
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
     filterset_class = TitleFilter
+    search_index = TITLE_INDEX
+    pagination_class = TitlePagination
     permission_classes = (
         IsAdminOrReadOnly, IsAuthenticatedOrReadOnly
     )
@@ -167,38 +211,194 @@ class TitleViewSet(viewsets.ModelViewSet):
             return TitlePostSerializer
         return TitleBaseSerializer
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Создает список произведений одним запросом. Каждое
+        проверяется отдельно, ошибки возвращаются по индексу в списке,
+        а корректные произведения создаются в одной транзакции."""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'detail': 'Ожидается непустой список произведений.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > MAX_BULK_TITLES:
+            return Response(
+                {'detail': f'Не больше {MAX_BULK_TITLES} произведений '
+                           f'за один запрос.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        valid, errors = [], []
+        for index, item in enumerate(items):
+            serializer = TitlePostSerializer(data=item)
+            if serializer.is_valid():
+                data = dict(serializer.validated_data)
+                genres = data.pop('genre')
+                valid.append((index, Title(**data), genres))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        titles = Title.objects.bulk_create_with_genres(
+            [(title, genres) for _, title, genres in valid]
+        )
+        if titles:
+            transaction.on_commit(title_suggest_index.version.bump)
+            transaction.on_commit(lambda: bump_resources('titles'))
+        return Response(
+            {
+                'created': [
+                    {'index': index, 'id': title.pk}
+                    for (index, _, _), title in zip(valid, titles)
+                ],
+                'errors': errors,
+            },
+            status=(status.HTTP_201_CREATED if titles
+                    else status.HTTP_400_BAD_REQUEST)
+        )
+
+    @action(methods=['GET'], detail=False, url_path='batch')
+    def batch(self, request):
+        """Произведения по списку ?ids=1,5,9 в порядке запроса
+        за один запрос к произведениям и один к их жанрам.
+        Ненайденные id перечислены в missing."""
+        serializer = TitleIdsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        titles = self.get_queryset().in_bulk(ids)
+        return Response({
+            'results': TitleBaseSerializer(
+                [titles[pk] for pk in ids if pk in titles], many=True
+            ).data,
+            'missing': [pk for pk in ids if pk not in titles],
+        })
+
+    @action(methods=['GET'], detail=False, url_path='ratings')
+    def ratings(self, request):
+        """Только рейтинг и число отзывов по списку ?ids= одним
+        запросом к таблице произведений. ETag считается по самим
+        значениям, поэтому при неизменных рейтингах клиент с
+        If-None-Match получает 304 без тела."""
+        serializer = TitleIdsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        rows = Title.objects.filter(
+            pk__in=serializer.validated_data['ids']
+        ).order_by('pk').values_list('pk', 'rating', 'review_count')
+        data = {
+            pk: {'rating': rating, 'review_count': review_count}
+            for pk, rating, review_count in rows
+        }
+        etag = quote_etag(hashlib.md5(
+            json.dumps(list(data.items())).encode('utf8')
+        ).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='suggest')
+    def suggest(self, request):
+        """Подсказки по началу слов названия из индекса в памяти,
+        без запросов к БД. ?q= - префикс, ?order=rating|popularity,
+        ?limit= - сколько подсказок вернуть."""
+        serializer = TitleSuggestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(title_suggest_index.suggest(
+            serializer.validated_data['q'],
+            limit=serializer.validated_data['limit'],
+            order=serializer.validated_data['order'],
+        ))
+
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(CachedResponseMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для отзывов."""
+    # Удаление произведения без отзывов меняет только версию titles,
+    # а список его отзывов после этого должен отвечать 404.
+    resources = ('titles', 'reviews')
+    single_flight = single_flight
     serializer_class = ReviewSerializer
+    pagination_class = PubDateKeysetPagination
     permission_classes = (
         IsAuthorOrModerPlusOrReadOnly, IsAuthenticatedOrReadOnly
     )
 
     def get_title(self):
-        id = self.kwargs.get('title_id')
-        return get_object_or_404(Title, id=id)
+        return get_identity_map(self.request).get(
+            Title.objects.all(), self.kwargs.get('title_id')
+        )
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return self.get_title().reviews.with_author_username()
+
+    def check_object_permissions(self, request, obj):
+        get_identity_map(request).attach(obj, 'author', 'title')
+        super().check_object_permissions(request, obj)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, title=self.get_title())
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет для комментариев."""
+    # Удаление отзыва без комментариев меняет только версию reviews.
+    resources = ('reviews', 'comments')
     serializer_class = CommentSerializer
+    pagination_class = PubDateKeysetPagination
     permission_classes = (
         IsAuthorOrModerPlusOrReadOnly, IsAuthenticatedOrReadOnly
     )
 
     def get_review(self):
-        id = self.kwargs.get('review_id')
-        return get_object_or_404(Review, id=id)
+        """Отзыв из URL, который должен относиться к произведению
+        из того же URL, иначе 404."""
+        return get_identity_map(self.request).get(
+            Review.objects.filter(title_id=self.kwargs.get('title_id')),
+            self.kwargs.get('review_id')
+        )
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        """Комментарии одним запросом с JOIN на отзыв, отфильтрованные
+        по обоим параметрам URL, поэтому комментарий к отзыву другого
+        произведения не найдется и в detail-запросах."""
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id'),
+        ).with_author_username()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if not page:
+            # Пустая страница не отличает отзыв без комментариев
+            # от несуществующей пары произведение-отзыв.
+            self.get_review()
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def check_object_permissions(self, request, obj):
+        get_identity_map(request).attach(obj, 'author', 'review')
+        super().check_object_permissions(request, obj)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, review=self.get_review())
+
+
+class SearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Полнотекстовый поиск для модераторов: ?search= плюс фильтры
+    по произведению, автору и диапазону дат публикации."""
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
+    permission_classes = (IsModeratorOrAdmin,)
+
+
+class ReviewSearchViewSet(SearchViewSet):
+    queryset = Review.objects.with_author_username()
+    serializer_class = ReviewSerializer
+    filterset_class = ReviewSearchFilter
+    search_index = REVIEW_INDEX
+
+
+class CommentSearchViewSet(SearchViewSet):
+    queryset = Comment.objects.with_author_username()
+    serializer_class = CommentSerializer
+    filterset_class = CommentSearchFilter
+    search_index = COMMENT_INDEX
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
 application = get_asgi_application()
+
+# Индекс подсказок строится при старте процесса, а не на первом запросе.
+from search.suggest import title_suggest_index  # noqa: E402
+
+title_suggest_index.warm_up()
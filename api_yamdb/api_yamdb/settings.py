@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'api',
     'reviews',
     'users.apps.UsersConfig',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -108,6 +109,44 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
 
+# Файлы версий данных, общие для всех процессов сервера.
+VERSION_FILES_DIR = BASE_DIR / 'var' / 'versions'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Общий для процессов сервера вариант кэша ответов.
+    'responses-file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+# Кэш ответов на анонимные запросы к каталогу: 'responses' в памяти
+# процесса или 'responses-file', если процессов несколько.
+RESPONSE_CACHE_ALIAS = 'responses'
+# Сколько секунд с момента построения можно отдавать устаревший ответ,
+# пока БД занята, по basename вьюсета. Для остальных вьюсетов ответ
+# всегда пересчитывается синхронно.
+MAX_STALE_AGE = {
+    'titles': 60,
+    'genres': 600,
+    'categories': 600,
+}
+# Сколько секунд ждать пересчета ответа, прежде чем отдать устаревший.
+STALE_REFRESH_TIMEOUT = 0.5
+
+# Сколько произведений можно создать одним запросом к /titles/bulk/.
+MAX_BULK_TITLES = 5000
+# Сколько id можно запросить одним запросом к /titles/batch/.
+MAX_BATCH_IDS = 100
+
 MIN_SCORE = 0
 MAX_SCORE = 10
 
@@ -118,7 +157,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.SelectablePagination',
     'PAGE_SIZE': 5,
 }
 
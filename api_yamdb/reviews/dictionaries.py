@@ -0,0 +1,61 @@
+from .models import Category, Genre
+from .versions import VersionFile
+
+
+class DictionaryCache:
+    """Вся таблица-справочник в памяти процесса, по slug и по id.
+
+    Категорий и жанров мало, и меняются они редко, поэтому таблица
+    читается целиком одним запросом и держится до смены версии.
+    Версию поднимают сигналы на сохранение и удаление записей, а
+    процессы сверяют ее через VersionFile, то есть одним stat().
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version = VersionFile(model._meta.db_table)
+        # (версия, {slug: запись}, {id: запись}) заменяется целиком,
+        # поэтому потокам не нужна блокировка на чтение.
+        self.snapshot = None
+
+    def __deepcopy__(self, memo):
+        # DRF копирует аргументы полей для каждого экземпляра
+        # сериализатора, а кэш должен остаться общим на процесс.
+        return self
+
+    def load(self):
+        version = self.version.current()
+        objects = list(self.model.objects.all())
+        self.snapshot = (
+            version,
+            {obj.slug: obj for obj in objects},
+            {obj.pk: obj for obj in objects},
+        )
+        return self.snapshot
+
+    def get_snapshot(self):
+        snapshot = self.snapshot
+        if snapshot is None or snapshot[0] != self.version.current():
+            snapshot = self.load()
+        return snapshot
+
+    def get_by_slug(self, slug):
+        return self.get_snapshot()[1].get(slug)
+
+    def get_by_id(self, pk):
+        if pk is None:
+            return None
+        obj = self.get_snapshot()[2].get(pk)
+        if obj is None:
+            # Запись могла появиться в другом процессе раньше,
+            # чем он поднял версию.
+            obj = self.load()[2].get(pk)
+        return obj
+
+    def invalidate(self):
+        self.snapshot = None
+        self.version.bump()
+
+
+category_cache = DictionaryCache(Category)
+genre_cache = DictionaryCache(Genre)
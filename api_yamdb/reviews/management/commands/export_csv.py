@@ -0,0 +1,139 @@
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+
+from django.core.management import BaseCommand, CommandError
+
+from reviews.models import Category, Comment, Genre, Review, Title, TitleGenre
+from users.models import User
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Имя файла, модель и пары (колонка в файле, поле модели) в том же
+# формате, в котором их читает import_csv.
+TABLES = (
+    ('category', Category, (
+        ('id', 'id'), ('name', 'name'), ('slug', 'slug'),
+    )),
+    ('genre', Genre, (
+        ('id', 'id'), ('name', 'name'), ('slug', 'slug'),
+    )),
+    ('users', User, (
+        ('id', 'id'), ('username', 'username'), ('email', 'email'),
+        ('role', 'role'), ('bio', 'bio'), ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+    )),
+    ('titles', Title, (
+        ('id', 'id'), ('name', 'name'), ('year', 'year'),
+        ('category', 'category_id'), ('description', 'description'),
+    )),
+    ('genre_title', TitleGenre, (
+        ('id', 'id'), ('title_id', 'title_id'), ('genre_id', 'genre_id'),
+    )),
+    ('review', Review, (
+        ('id', 'id'), ('title_id', 'title_id'), ('text', 'text'),
+        ('author', 'author_id'), ('score', 'score'),
+        ('pub_date', 'pub_date'),
+    )),
+    ('comments', Comment, (
+        ('id', 'id'), ('review_id', 'review_id'), ('text', 'text'),
+        ('author', 'author_id'), ('pub_date', 'pub_date'),
+    )),
+)
+
+
+def format_value(value):
+    # isoformat сохраняет микросекунды, которые DjangoJSONEncoder
+    # обрезает до миллисекунд.
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class CsvWriter:
+    extension = 'csv'
+
+    def __init__(self, file, columns):
+        self.writer = csv.writer(file)
+        self.writer.writerow(columns)
+
+    def write(self, values):
+        self.writer.writerow(format_value(value) for value in values)
+
+
+class NdjsonWriter:
+    extension = 'ndjson'
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.columns = columns
+
+    def write(self, values):
+        self.file.write(json.dumps(
+            dict(zip(self.columns, map(format_value, values))),
+            ensure_ascii=False,
+        ))
+        self.file.write('\n')
+
+
+class Command(BaseCommand):
+    """Выгружает таблицы в csv-файлы в формате import_csv."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output_dir',
+            help='Папка, в которую будут записаны файлы.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Количество строк, читаемых из БД за один раз.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы gzip.',
+        )
+        parser.add_argument(
+            '--ndjson',
+            action='store_true',
+            help='Писать по одному json-объекту на строку вместо csv.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        os.makedirs(options['output_dir'], exist_ok=True)
+        writer_class = NdjsonWriter if options['ndjson'] else CsvWriter
+        for name, model, columns in TABLES:
+            path = os.path.join(
+                options['output_dir'], f'{name}.{writer_class.extension}'
+            )
+            if options['gzip']:
+                path += '.gz'
+            self.export_table(
+                path, model, columns, writer_class, options['gzip'],
+                options['chunk_size']
+            )
+
+    def export_table(self, path, model, columns, writer_class, compress,
+                     chunk_size):
+        started = time.monotonic()
+        count = 0
+        opener = gzip.open if compress else open
+        rows = model.objects.order_by('pk').values_list(
+            *(field for _, field in columns)
+        ).iterator(chunk_size=chunk_size)
+        with opener(path, 'wt', encoding='utf8', newline='') as file:
+            writer = writer_class(file, [column for column, _ in columns])
+            for values in rows:
+                writer.write(values)
+                count += 1
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(
+            f'{path}: {count} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с)'
+        )
@@ -1,76 +1,593 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from csv import DictReader
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from reviews.models import Category, Comment, Genre, Review, Title, TitleGenre
+from reviews.dictionaries import category_cache, genre_cache
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre, normalize_name)
+from reviews.versions import RESOURCES, TITLE_NAMES, bump_resources
 from users.models import User
 
+DATA_DIR = settings.BASE_DIR / 'static' / 'data'
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHECKPOINT = settings.BASE_DIR / 'import_csv.checkpoint'
+# Значения PRAGMA на время --fast, исходные возвращаются после загрузки.
+# journal_mode не выключается совсем, чтобы ошибка внешнего ключа
+# могла откатить загрузку.
+FAST_PRAGMAS = (
+    ('journal_mode', 'MEMORY'),
+    ('synchronous', 'OFF'),
+    ('cache_size', -256 * 1024),
+    ('temp_store', 'MEMORY'),
+    ('foreign_keys', 'OFF'),
+)
 
-class Command(BaseCommand):
-    """Загружает csv-файла в БД из папки static/data/."""
 
-    def handle(self, *args, **options):
-        for row in DictReader(open('static/data/category.csv',
-                                   encoding='utf8')):
-            category = Category(name=row['name'], id=row['id'],
-                                slug=row['slug'])
-            category.save()
-        for row in DictReader(open('static/data/genre.csv', encoding='utf8')):
-            genre = Genre(name=row['name'], id=row['id'], slug=row['slug'])
-            genre.save()
-        for row in DictReader(open('static/data/titles.csv', encoding='utf8')):
-            title = Title(
-                name=row['name'],
-                id=row['id'],
-                year=row['year'],
-                category=Category.objects.get(pk=row['category'])
-            )
-            title.save()
-        for row in DictReader(open('static/data/genre_title.csv',
-                                   encoding='utf8')):
-            genre_title = TitleGenre(
-                id=row['id'],
-                title=Title.objects.get(pk=row['title_id']),
-                genre=Genre.objects.get(pk=row['genre_id'])
+class IdMap:
+    """Множества id уже загруженных объектов для проверки
+    внешних ключей без обращения к БД на каждую строку."""
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, model):
+        with self._lock:
+            if model not in self._ids:
+                self._ids[model] = set(
+                    model.objects.values_list('pk', flat=True)
+                )
+            return self._ids[model]
+
+    def add(self, model, ids):
+        model_ids = self[model]
+        with self._lock:
+            model_ids.update(ids)
+
+    def resolve(self, model, value):
+        pk = int(value)
+        if pk not in self[model]:
+            raise CommandError(
+                f'{model.__name__} с id={pk} не найден.'
             )
-            genre_title.save()
-        for row in DictReader(open('static/data/users.csv', encoding='utf8')):
-            user = User(
-                id=row['id'],
-                username=row['username'],
-                email=row['email'],
-                role=row['role'],
-                bio=row['bio'],
-                first_name=row['first_name'],
-                last_name=row['last_name']
+        return pk
+
+    def check(self):
+        """Ссылки уже проверены в resolve()."""
+
+
+class ChunkIdCheck:
+    """Заменяет IdMap в режиме --stream: id внешних ключей пачки
+    собираются при сборке объектов и проверяются в check() запросом
+    filter(pk__in=...) на каждую модель. Загруженные id не хранятся,
+    поэтому память зависит от --batch-size, а не от размера таблиц."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def resolve(self, model, value):
+        pk = int(value)
+        self.pending.setdefault(model, set()).add(pk)
+        return pk
+
+    def add(self, model, ids):
+        pass
+
+    def check(self):
+        pending, self.pending = self.pending, {}
+        for model, pks in pending.items():
+            missing = set(pks)
+            for chunk in batches(pks, connection.features.max_query_params):
+                missing.difference_update(
+                    model.objects.filter(pk__in=chunk).values_list(
+                        'pk', flat=True
+                    )
+                )
+            if missing:
+                raise CommandError(
+                    f'{model.__name__} с id={min(missing)} не найден.'
+                )
+
+
+class UncheckedIdMap:
+    """Заменяет IdMap в режиме --fast: внешние ключи проверяются
+    одним PRAGMA foreign_key_check после загрузки."""
+
+    def resolve(self, model, value):
+        return int(value)
+
+    def add(self, model, ids):
+        pass
+
+
+def build_category(row, ids):
+    return Category(id=row['id'], name=row['name'], slug=row['slug'])
+
+
+def build_genre(row, ids):
+    return Genre(id=row['id'], name=row['name'], slug=row['slug'])
+
+
+def build_user(row, ids):
+    return User(
+        id=row['id'],
+        username=row['username'],
+        email=row['email'],
+        role=row['role'],
+        bio=row['bio'],
+        first_name=row['first_name'],
+        last_name=row['last_name'],
+    )
+
+
+def build_title(row, ids):
+    return Title(
+        id=row['id'],
+        name=row['name'],
+        name_key=normalize_name(row['name']),
+        year=row['year'],
+        description=row.get('description', ''),
+        category_id=(
+            ids.resolve(Category, row['category']) if row['category']
+            else None
+        ),
+    )
+
+
+def build_genre_title(row, ids):
+    return TitleGenre(
+        id=row['id'],
+        title_id=ids.resolve(Title, row['title_id']),
+        genre_id=ids.resolve(Genre, row['genre_id']),
+    )
+
+
+def build_review(row, ids):
+    return Review(
+        id=row['id'],
+        title_id=ids.resolve(Title, row['title_id']),
+        text=row['text'],
+        author_id=ids.resolve(User, row['author']),
+        score=row['score'],
+        pub_date=row['pub_date'],
+    )
+
+
+def build_comment(row, ids):
+    return Comment(
+        id=row['id'],
+        review_id=ids.resolve(Review, row['review_id']),
+        text=row['text'],
+        author_id=ids.resolve(User, row['author']),
+        pub_date=row['pub_date'],
+    )
+
+
+# Порядок важен: таблица загружается после тех, на которые ссылается.
+# Последний элемент - таблицы, на которые ссылаются внешние ключи.
+TABLES = (
+    ('category', Category, build_category, ()),
+    ('genre', Genre, build_genre, ()),
+    ('users', User, build_user, ()),
+    ('titles', Title, build_title, ('category',)),
+    ('genre_title', TitleGenre, build_genre_title, ('titles', 'genre')),
+    ('review', Review, build_review, ('titles', 'users')),
+    ('comments', Comment, build_comment, ('review', 'users')),
+)
+
+
+class Checkpoint:
+    """Файл с именем таблицы и количеством уже загруженных строк.
+
+    Пишется через временный файл и os.replace, чтобы сбой во время
+    записи не оставил на диске обрезанный json.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf8') as checkpoint_file:
+                data = json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+        return data['table'], data['row']
+
+    def save(self, table, row):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as checkpoint_file:
+            json.dump({'table': table, 'row': row}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteFastLoad:
+    """Готовит SQLite к массовой загрузке и возвращает все обратно.
+
+    На входе выставляет FAST_PRAGMAS, на выходе восстанавливает
+    исходные значения. journal_mode и foreign_keys внутри транзакции
+    не меняются, поэтому менеджер оборачивает transaction.atomic().
+
+    Вторичные индексы удаляет drop_indexes() и создает заново по
+    сохраненному из sqlite_master SQL create_indexes(). Оба вызываются
+    внутри транзакции загрузки, и при сбое откат возвращает индексы
+    вместе с данными. Уникальные ограничения в SQLite встроены
+    в таблицу и поддерживаются во время вставки, удалить их без
+    пересоздания таблицы нельзя.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.indexes = []
+        self.pragmas = []
+
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            for name, _ in FAST_PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                self.pragmas.append((name, cursor.fetchone()[0]))
+            self.set_pragmas(cursor, FAST_PRAGMAS)
+        return self
+
+    def __exit__(self, *exc_info):
+        with connection.cursor() as cursor:
+            self.set_pragmas(cursor, self.pragmas)
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                'AND sql IS NOT NULL AND tbl_name IN ({})'.format(
+                    ', '.join(['%s'] * len(self.tables))
+                ),
+                self.tables,
             )
-            user.save()
-        for row in DictReader(open('static/data/titles.csv', encoding='utf8')):
-            title = Title(
-                name=row['name'],
-                id=row['id'],
-                year=row['year'],
-                category=Category.objects.get(pk=row['category'])
+            self.indexes = cursor.fetchall()
+            for name, _ in self.indexes:
+                cursor.execute(
+                    f'DROP INDEX {connection.ops.quote_name(name)}'
+                )
+
+    def create_indexes(self):
+        with connection.cursor() as cursor:
+            for _, sql in self.indexes:
+                cursor.execute(sql)
+
+    def set_pragmas(self, cursor, pragmas):
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def keep_pub_date():
+    """Отключает auto_now_add у дат публикации на время загрузки.
+
+    bulk_create вызывает pre_save полей, и auto_now_add заменил бы
+    дату из csv-файла текущим временем.
+    """
+    fields = [model._meta.get_field('pub_date') for model in (
+        Review, Comment
+    )]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def read_rows(path):
+    """Разбирает csv-файл целиком. Вызывается в отдельном процессе,
+    поэтому файлы разбираются параллельно на всех ядрах."""
+    with open(path, encoding='utf8', newline='') as csv_file:
+        return list(DictReader(csv_file))
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    """Загружает csv-файлы в БД из папки static/data/."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            default=DATA_DIR,
+            help='Папка с csv-файлами.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT.',
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Фиксировать каждую пачку строк отдельной транзакцией '
+                 'и сохранять контрольную точку после нее.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить загрузку с последней контрольной точки. '
+                 'Включает --stream.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=DEFAULT_CHECKPOINT,
+            help='Файл контрольной точки для --stream и --resume.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество таблиц, загружаемых одновременно. '
+                 'Независимые таблицы загружаются параллельно, '
+                 'зависимые ждут только свои внешние ключи.',
+        )
+        parser.add_argument(
+            '--fast',
+            action='store_true',
+            help='Быстрая загрузка в SQLite: PRAGMA на время загрузки, '
+                 'вставка через executemany без ORM, пересоздание '
+                 'индексов и ANALYZE после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        self.check_options(options)
+        with keep_pub_date():
+            if options['fast']:
+                self.load_fast(options['data_dir'], options['batch_size'])
+            elif options['workers'] > 1:
+                self.load_parallel(
+                    options['data_dir'], options['batch_size'],
+                    options['workers']
+                )
+            else:
+                self.load_sequential(options)
+        # bulk_create не вызывает сигналы, поэтому рейтинг
+        # произведений пересчитывается после загрузки отзывов,
+        # а кэши справочников, подсказок и ответов сбрасываются вручную.
+        Title.objects.recalculate_rating()
+        category_cache.invalidate()
+        genre_cache.invalidate()
+        TITLE_NAMES.bump()
+        bump_resources(*RESOURCES)
+        if options['fast']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        elif options['stream'] or options['resume']:
+            Checkpoint(options['checkpoint']).clear()
+
+    def check_options(self, options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть больше нуля.')
+        modes = [
+            flag for flag, enabled in (
+                ('--fast', options['fast']),
+                ('--workers', options['workers'] > 1),
+                ('--stream/--resume', options['stream'] or options['resume']),
+            ) if enabled
+        ]
+        if len(modes) > 1:
+            raise CommandError(
+                f'Режимы {", ".join(modes)} нельзя совмещать.'
             )
-            title.save()
-        for row in DictReader(open('static/data/review.csv',
-                                   encoding='utf8')):
-            review = Review(
-                id=row['id'],
-                title=Title.objects.get(pk=row['title_id']),
-                text=row['text'],
-                author=User.objects.get(pk=row['author']),
-                score=row['score'],
-                pub_date=row['pub_date']
+        if options['fast'] and connection.vendor != 'sqlite':
+            raise CommandError('--fast работает только с SQLite.')
+
+    def load_sequential(self, options):
+        stream = options['stream'] or options['resume']
+        checkpoint = Checkpoint(options['checkpoint']) if stream else None
+        start_index, start_row = 0, 0
+        resumed = options['resume']
+        if resumed:
+            start_index, start_row = self.resume_position(checkpoint)
+        ids = ChunkIdCheck() if stream else IdMap()
+        for index in range(start_index, len(TABLES)):
+            name, model, build, _ = TABLES[index]
+            path = f'{options["data_dir"]}/{name}.csv'
+            if stream:
+                self.stream_table(
+                    path, name, model, build, ids, options['batch_size'],
+                    checkpoint, start_row, resumed
+                )
+                if index + 1 < len(TABLES):
+                    checkpoint.save(TABLES[index + 1][0], 0)
+            else:
+                self.load_table(
+                    path, model, build, ids, options['batch_size']
+                )
+            start_row, resumed = 0, False
+
+    def resume_position(self, checkpoint):
+        """Возвращает индекс таблицы в TABLES и номер строки,
+        с которых нужно продолжить загрузку."""
+        saved = checkpoint.load()
+        if saved is None:
+            self.stdout.write(
+                'Контрольная точка не найдена, загрузка с начала.'
             )
-            review.save()
-        for row in DictReader(open('static/data/comments.csv',
-                                   encoding='utf8')):
-            comment = Comment(
-                id=row['id'],
-                review=Review.objects.get(pk=row['review_id']),
-                text=row['text'],
-                author=User.objects.get(pk=row['author']),
-                pub_date=row['pub_date']
+            return 0, 0
+        table, row = saved
+        names = [name for name, *_ in TABLES]
+        if table not in names:
+            raise CommandError(
+                f'Неизвестная таблица в контрольной точке: {table}.'
             )
-            comment.save()
+        self.stdout.write(f'Продолжение с {table}.csv, строка {row}.')
+        return names.index(table), row
+
+    def insert(self, model, build, rows, ids, batch_size,
+               ignore_conflicts=False):
+        objects = [build(row, ids) for row in rows]
+        ids.check()
+        model.objects.bulk_create(
+            objects, batch_size=batch_size, ignore_conflicts=ignore_conflicts
+        )
+        ids.add(model, (int(obj.pk) for obj in objects))
+        return len(objects)
+
+    def load_table(self, path, model, build, ids, batch_size):
+        started = time.monotonic()
+        count = 0
+        with open(path, encoding='utf8', newline='') as csv_file:
+            with transaction.atomic():
+                for batch in batches(DictReader(csv_file), batch_size):
+                    count += self.insert(model, build, batch, ids, batch_size)
+        self.report(path, count, time.monotonic() - started)
+
+    def load_parallel(self, data_dir, batch_size, workers):
+        """Загружает таблицы в пуле потоков по графу зависимостей.
+
+        Файлы разбираются в пуле процессов, объекты собираются в потоке
+        таблицы, как только загружены таблицы, на которые она ссылается.
+        SQLite допускает только одного писателя, поэтому для нее запись
+        идет под общей блокировкой, а разбор и сборка строк - параллельно.
+        """
+        ids = IdMap()
+        write_lock = (
+            threading.Lock() if connection.vendor == 'sqlite'
+            else nullcontext()
+        )
+        loaded = {}
+        with ProcessPoolExecutor(workers) as parsers, \
+                ThreadPoolExecutor(workers) as loaders:
+            # Таблицы ставятся в очередь в порядке TABLES, поэтому к моменту
+            # запуска задачи все ее зависимости уже выполняются или готовы.
+            for name, model, build, depends in TABLES:
+                path = f'{data_dir}/{name}.csv'
+                loaded[name] = loaders.submit(
+                    self.load_rows, path, model, build, ids, batch_size,
+                    parsers.submit(read_rows, path),
+                    [loaded[dependency] for dependency in depends],
+                    write_lock,
+                )
+            for future in loaded.values():
+                future.result()
+
+    def load_rows(self, path, model, build, ids, batch_size, parsed,
+                  depends, write_lock):
+        try:
+            rows = parsed.result()
+            for dependency in depends:
+                dependency.result()
+            started = time.monotonic()
+            objects = [build(row, ids) for row in rows]
+            with write_lock, transaction.atomic():
+                model.objects.bulk_create(objects, batch_size=batch_size)
+                ids.add(model, (int(obj.pk) for obj in objects))
+            self.report(path, len(objects), time.monotonic() - started)
+        finally:
+            connection.close()
+
+    def load_fast(self, data_dir, batch_size):
+        tables = [model._meta.db_table for _, model, *_ in TABLES]
+        ids = UncheckedIdMap()
+        with SqliteFastLoad(tables) as fast_load, transaction.atomic():
+            fast_load.drop_indexes()
+            for name, model, build, _ in TABLES:
+                self.insert_raw(
+                    f'{data_dir}/{name}.csv', model, build, ids, batch_size
+                )
+            self.check_foreign_keys(tables)
+            fast_load.create_indexes()
+
+    def insert_raw(self, path, model, build, ids, batch_size):
+        """Вставляет строки через executemany на курсоре БД,
+        модели используются только для приведения значений."""
+        started = time.monotonic()
+        count = 0
+        fields = model._meta.concrete_fields
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(
+                connection.ops.quote_name(field.column) for field in fields
+            ),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with open(path, encoding='utf8', newline='') as csv_file, \
+                connection.cursor() as cursor:
+            for batch in batches(DictReader(csv_file), batch_size):
+                cursor.executemany(sql, [
+                    [
+                        field.get_db_prep_save(
+                            getattr(obj, field.attname), connection
+                        )
+                        for field in fields
+                    ]
+                    for obj in (build(row, ids) for row in batch)
+                ])
+                count += len(batch)
+        self.report(path, count, time.monotonic() - started)
+
+    def check_foreign_keys(self, tables):
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(
+                    'PRAGMA foreign_key_check'
+                    f'({connection.ops.quote_name(table)})'
+                )
+                violations = cursor.fetchall()
+                if violations:
+                    raise CommandError(
+                        f'{table}: {len(violations)} строк ссылаются на '
+                        f'несуществующие записи, загрузка отменена.'
+                    )
+
+    def stream_table(self, path, name, model, build, ids, batch_size,
+                     checkpoint, start_row, resumed=False):
+        """Загружает файл пачками по batch_size строк, в памяти
+        одновременно находится только одна пачка.
+
+        Контрольная точка сохраняется после фиксации пачки, и сбой
+        между ними оставляет в БД пачку, которой нет в контрольной
+        точке. Поэтому первая пачка после --resume вставляется
+        с ignore_conflicts: уже загруженные строки пропускаются.
+        """
+        started = time.monotonic()
+        offset = start_row
+        ignore_conflicts = resumed
+        with open(path, encoding='utf8', newline='') as csv_file:
+            rows = islice(DictReader(csv_file), start_row, None)
+            for batch in batches(rows, batch_size):
+                with transaction.atomic():
+                    self.insert(
+                        model, build, batch, ids, batch_size,
+                        ignore_conflicts
+                    )
+                ignore_conflicts = False
+                offset += len(batch)
+                checkpoint.save(name, offset)
+        self.report(path, offset - start_row, time.monotonic() - started)
+
+    def report(self, path, count, elapsed):
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(
+            f'{path}: {count} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с)'
+        )
@@ -0,0 +1,44 @@
+# Generated by Django 3.2 on 2026-10-18 16:38
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def fill_title_rating(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    titles = Title.objects.annotate(
+        _score_sum=Sum('reviews__score'),
+        _review_count=Count('reviews'),
+        _rating=Avg('reviews__score'),
+    ).filter(_review_count__gt=0)
+    for title in titles:
+        title.score_sum = title._score_sum
+        title.review_count = title._review_count
+        title.rating = title._rating
+        title.save(update_fields=('score_sum', 'review_count', 'rating'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_auto_20230505_2205'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_title_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 16:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_rating'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['-pub_date'], 'verbose_name': 'Комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-pub_date'], 'verbose_name': 'Отзыв', 'verbose_name_plural': 'Отзывы'},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 16:56
+
+from django.db import migrations, models
+
+from reviews.models import normalize_name
+
+
+def fill_name_key(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    titles = list(Title.objects.only('id', 'name'))
+    for title in titles:
+        title.name_key = normalize_name(title.name)
+    Title.objects.bulk_update(titles, ('name_key',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_review_comment_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='name_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+    ]
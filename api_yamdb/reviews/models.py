@@ -1,13 +1,43 @@
+import sys
+import unicodedata
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (Avg, Count, FloatField, IntegerField, OuterRef,
+                              Subquery, Sum)
+from django.db.models.functions import Coalesce
 
 from .validators import year_validator
 
 User = get_user_model()
 
 
+def normalize_name(value):
+    """Приводит название к виду для поиска по префиксу: NFKC,
+    casefold, ё как е и одиночные пробелы."""
+    value = unicodedata.normalize('NFKC', value).casefold()
+    return ' '.join(value.replace('ё', 'е').split())
+
+
+def prefix_upper_bound(prefix):
+    """Наименьшая строка, которая больше всех строк, начинающихся
+    с prefix, или None, если такой строки нет.
+
+    Последний символ заменяется следующим за ним, а символы U+10FFFF
+    в конце, у которых следующего нет, отбрасываются. Суррогаты
+    пропускаются: их нельзя записать в UTF-8 для параметра запроса.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
 class PubDateNowModel(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
@@ -58,11 +88,75 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    def recalculate_rating(self):
+        """Пересчитывает сумму оценок, количество отзывов и рейтинг
+        одним UPDATE-запросом. Вызывается сигналами отзывов для одного
+        произведения и после массовой загрузки, которая их обходит."""
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        return self.update(
+            score_sum=Coalesce(
+                Subquery(reviews.annotate(value=Sum('score')).values('value'),
+                         output_field=IntegerField()),
+                0,
+            ),
+            review_count=Coalesce(
+                Subquery(reviews.annotate(value=Count('pk')).values('value'),
+                         output_field=IntegerField()),
+                0,
+            ),
+            rating=Subquery(
+                reviews.annotate(value=Avg('score')).values('value'),
+                output_field=FloatField(),
+            ),
+        )
+
+    def bulk_create_with_genres(self, items, batch_size=None):
+        """Создает произведения и их связи с жанрами двумя bulk_create
+        в одной транзакции. items - пары (несохраненный Title, жанры).
+
+        bulk_create обходит Title.save() и сигналы, поэтому name_key
+        заполняется здесь, а индексы в памяти сбрасывает вызывающий.
+        """
+        titles = [title for title, _ in items]
+        for title in titles:
+            title.name_key = normalize_name(title.name)
+        with transaction.atomic():
+            self.bulk_create(titles, batch_size=batch_size)
+            if titles and titles[0].pk is None:
+                # SQLite в Django 3.2 не возвращает id из bulk_create.
+                # Транзакция держит блокировку записи с первого INSERT,
+                # поэтому последние len(titles) id принадлежат ей.
+                ids = self.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(titles)]
+                for title, pk in zip(titles, reversed(list(ids))):
+                    title.pk = pk
+            TitleGenre.objects.bulk_create(
+                [
+                    TitleGenre(title=title, genre=genre)
+                    for title, genres in items
+                    for genre in dict.fromkeys(genres)
+                ],
+                batch_size=batch_size,
+            )
+        return titles
+
+
 class Title(models.Model):
     name = models.CharField(
         max_length=256,
         verbose_name='Название',
     )
+    name_key = models.CharField(
+        max_length=256,
+        default='',
+        db_index=True,
+        editable=False,
+        verbose_name='Название для поиска',
+    )
     year = models.PositiveSmallIntegerField(
         validators=(year_validator,),
         verbose_name='Дата выхода',
@@ -85,6 +179,24 @@ class Title(models.Model):
         null=True,
         blank=True,
     )
+    score_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сумма оценок',
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество отзывов',
+    )
+    rating = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Рейтинг',
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ('year',)
@@ -97,6 +209,13 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        super().save(*args, **kwargs)
+
 
 class TitleGenre(models.Model):
     title = models.ForeignKey(
@@ -122,6 +241,16 @@ class TitleGenre(models.Model):
         return f'{self.title} {self.genre}'
 
 
+class AuthoredQuerySet(models.QuerySet):
+    def with_author_username(self):
+        """Автор загружается тем же запросом через JOIN, из его полей
+        выбирается только username, которое и выводит API."""
+        return self.select_related('author').only(
+            *(field.name for field in self.model._meta.concrete_fields),
+            'author__username',
+        )
+
+
 class Review(PubDateNowModel):
     """Модель отзыва."""
 
@@ -151,7 +280,9 @@ class Review(PubDateNowModel):
         ],
     )
 
-    class Meta:
+    objects = AuthoredQuerySet.as_manager()
+
+    class Meta(PubDateNowModel.Meta):
         constraints = [
             models.UniqueConstraint(
                 fields=['title', 'author'],
@@ -161,6 +292,20 @@ class Review(PubDateNowModel):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженные значения, чтобы при переносе отзыва
+        # пересчитать рейтинг и прежнего произведения.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения обновляется в сигнале post_save,
+        # поэтому сохранение отзыва и пересчет идут одной транзакцией.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         nl = '\n'
         return f'Отзыв: {self.text}{nl}Оценка: {self.score}'
@@ -182,7 +327,9 @@ class Comment(PubDateNowModel):
         related_name='comments'
     )
 
-    class Meta:
+    objects = AuthoredQuerySet.as_manager()
+
+    class Meta(PubDateNowModel.Meta):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
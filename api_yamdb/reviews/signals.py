@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete,
+                                      post_migrate, post_save, pre_save)
+from django.dispatch import receiver
+
+from .dictionaries import category_cache, genre_cache
+from .models import Category, Comment, Genre, Review, Title, TitleGenre
+from .versions import RESOURCES, TITLE_NAMES, bump_resources
+
+
+def update_title_rating(title_id):
+    """Пересчитывает сумму оценок, число отзывов и рейтинг
+    произведения по таблице отзывов.
+
+    Вызывается в транзакции сохранения или удаления отзыва, после
+    записи, поэтому видит и ее, и все зафиксированные до нее изменения.
+    Разница со снимком, загруженным раньше, здесь не подходит:
+    два экземпляра одного отзыва, сохраненные или удаленные внахлест,
+    применили бы ее дважды.
+    """
+    Title.objects.filter(pk=title_id).recalculate_rating()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    old_title_id = loaded.get('title_id', instance.title_id)
+    if old_title_id != instance.title_id:
+        update_title_rating(old_title_id)
+    update_title_rating(instance.title_id)
+    instance._loaded_values = {**loaded, 'title_id': instance.title_id}
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """Срабатывает и при каскадном удалении отзывов
+    вместе с пользователем или произведением."""
+    update_title_rating(instance.title_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    transaction.on_commit(category_cache.invalidate)
+    transaction.on_commit(lambda: bump_resources('categories', 'titles'))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed(sender, **kwargs):
+    transaction.on_commit(genre_cache.invalidate)
+    transaction.on_commit(lambda: bump_resources('genres', 'titles'))
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+@receiver(post_save, sender=TitleGenre)
+@receiver(post_delete, sender=TitleGenre)
+def title_data_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_resources('titles'))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, **kwargs):
+    """Рейтинг входит в ответы /titles/, поэтому отзыв
+    сбрасывает и версию произведений."""
+    transaction.on_commit(lambda: bump_resources('reviews', 'titles'))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_resources('comments'))
+
+
+@receiver(pre_save, sender=get_user_model())
+def username_changed(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    """username автора входит в ответы с отзывами и комментариями."""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    if sender.objects.filter(pk=instance.pk).exclude(
+        username=instance.username
+    ).exists():
+        transaction.on_commit(lambda: bump_resources('reviews', 'comments'))
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(lambda: bump_resources('titles'))
+
+
+@receiver(post_migrate)
+def database_reset(sender, **kwargs):
+    """migrate и flush меняют данные в обход сигналов моделей."""
+    if sender.name != 'reviews':
+        return
+    category_cache.invalidate()
+    genre_cache.invalidate()
+    TITLE_NAMES.bump()
+    bump_resources(*RESOURCES)
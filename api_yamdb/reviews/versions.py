@@ -0,0 +1,66 @@
+import os
+import uuid
+
+from django.conf import settings
+
+
+class VersionFile:
+    """Номер версии данных, общий для всех процессов на сервере.
+
+    Версия - это файл в settings.VERSION_FILES_DIR. bump() атомарно
+    подменяет его новым через os.replace, поэтому у файла меняется
+    inode, а current() обходится одним stat() без обращения к БД.
+    Процесс сравнивает current() с запомненным значением и понимает,
+    что данные изменил другой процесс.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def path(self):
+        return os.path.join(settings.VERSION_FILES_DIR, self.name)
+
+    def current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self):
+        os.makedirs(settings.VERSION_FILES_DIR, exist_ok=True)
+        tmp_path = f'{self.path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as version_file:
+            version_file.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self.path)
+        return self.current()
+
+
+# Версии групп данных, от которых зависят ответы API. Их поднимают
+# сигналы при любом изменении данных группы, а кэши ответов сверяют
+# запомненную версию с текущей вместо ожидания TTL.
+RESOURCES = {
+    name: VersionFile(f'resource-{name}')
+    for name in ('titles', 'genres', 'categories', 'reviews', 'comments')
+}
+
+
+# Версия набора названий произведений для индексов в памяти процессов
+# (подсказки поиска). Рейтинги меняют только RESOURCES['titles'], чтобы
+# каждый новый отзыв не перестраивал индекс целиком.
+TITLE_NAMES = VersionFile('titles')
+
+
+def resource_version(resources):
+    # Файл версии создается при первом чтении, чтобы у ответов
+    # всегда была дата изменения для Last-Modified.
+    return tuple(
+        RESOURCES[name].current() or RESOURCES[name].bump()
+        for name in resources
+    )
+
+
+def bump_resources(*resources):
+    for name in resources:
+        RESOURCES[name].bump()
@@ -0,0 +1,212 @@
+import re
+
+from django.db import connection, migrations
+from django.db.models import Q
+
+TOKEN_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+# Окончания русских слов, от длинных к коротким. Слово в запросе
+# ищется как префикс, поэтому отрезанное окончание находит и другие
+# формы: "фильмов" -> "фильм*" найдет "фильм", "фильмы", "фильме".
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ией', 'иях', 'ах', 'ях', 'ов', 'ев', 'ей', 'ой', 'ый', 'ий', 'ая',
+    'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ом', 'ем', 'ам', 'ям',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+# SQL-выражение, которым триггеры приводят текст к виду индекса.
+# Токенизатор unicode61 сам приводит регистр, но не считает ё и е
+# одной буквой.
+NORMALIZE_SQL = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def stem(token):
+    """Отрезает у русского слова окончание, если остается
+    не меньше MIN_STEM_LENGTH букв."""
+    if not CYRILLIC_RE.match(token):
+        return token
+    for ending in RUSSIAN_ENDINGS:
+        if (token.endswith(ending)
+                and len(token) - len(ending) >= MIN_STEM_LENGTH):
+            return token[:-len(ending)]
+    return token
+
+
+def match_query(text):
+    """Превращает пользовательский ввод в запрос FTS5: основа каждого
+    слова в кавычках, как префикс, слова объединяются через AND.
+    Кавычки не дают вводу использовать синтаксис FTS5."""
+    return ' '.join(f'"{stem(token)}"*' for token in tokenize(text))
+
+
+def run_on_sqlite(sql_list):
+    """Функция для RunPython, выполняющая sql_list только в SQLite."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sql_list:
+            schema_editor.execute(sql)
+    return run
+
+
+class FtsIndex:
+    """Contentless-таблица FTS5 над колонками исходной таблицы.
+
+    Индекс поддерживают триггеры на вставку, изменение и удаление
+    строк исходной таблицы, поэтому он остается согласованным и при
+    bulk_create, и при update() по QuerySet.
+
+    Триггеры принадлежат исходной таблице: миграция, пересоздающая ее
+    в SQLite, удаляет и их. За такой миграцией должна следовать
+    миграция search с restore_migration(), как 0003 после
+    reviews.0006_title_name_key. Команда rebuild_search_index тоже
+    создает триггеры заново.
+    """
+
+    def __init__(self, name, source, columns, weights):
+        self.name = name
+        self.source = source
+        self.columns = columns
+        self.weights = weights
+
+    def values(self, prefix):
+        return ', '.join(
+            NORMALIZE_SQL.format(f'{prefix}.{column}')
+            for column in self.columns
+        )
+
+    def create_sql(self):
+        columns = ', '.join(self.columns)
+        return [
+            f"CREATE VIRTUAL TABLE {self.name} USING fts5("
+            f"{columns}, content='', tokenize='unicode61')",
+        ] + self.trigger_sql()
+
+    def trigger_sql(self):
+        columns = ', '.join(self.columns)
+        return [
+            f'CREATE TRIGGER {self.name}_ai AFTER INSERT ON {self.source} '
+            f'BEGIN INSERT INTO {self.name}(rowid, {columns}) '
+            f"VALUES (new.id, {self.values('new')}); END",
+            f'CREATE TRIGGER {self.name}_ad AFTER DELETE ON {self.source} '
+            f'BEGIN INSERT INTO {self.name}({self.name}, rowid, {columns}) '
+            f"VALUES ('delete', old.id, {self.values('old')}); END",
+            f'CREATE TRIGGER {self.name}_au AFTER UPDATE OF {columns} '
+            f'ON {self.source} BEGIN '
+            f'INSERT INTO {self.name}({self.name}, rowid, {columns}) '
+            f"VALUES ('delete', old.id, {self.values('old')}); "
+            f'INSERT INTO {self.name}(rowid, {columns}) '
+            f"VALUES (new.id, {self.values('new')}); END",
+        ]
+
+    def migration(self):
+        """Операция миграции, создающая и заполняющая индекс.
+
+        FTS5 есть только в SQLite, на других СУБД поиск идет
+        через icontains и индекс не нужен.
+        """
+        return migrations.RunPython(
+            run_on_sqlite(self.create_sql() + self.rebuild_sql()),
+            run_on_sqlite(self.drop_sql()),
+        )
+
+    def restore_migration(self):
+        """Операция миграции, заново создающая триггеры и индекс.
+
+        Нужна после миграций, которые пересоздают исходную таблицу:
+        в SQLite так выполняются, например, добавление колонки со
+        значением по умолчанию и изменение ограничений.
+        """
+        return migrations.RunPython(
+            run_on_sqlite(self.restore_sql()),
+            migrations.RunPython.noop,
+        )
+
+    def restore_sql(self):
+        return self.drop_trigger_sql() + self.trigger_sql() + (
+            self.rebuild_sql()
+        )
+
+    def drop_trigger_sql(self):
+        return [
+            f'DROP TRIGGER IF EXISTS {self.name}_{suffix}'
+            for suffix in ('ai', 'ad', 'au')
+        ]
+
+    def drop_sql(self):
+        return self.drop_trigger_sql() + [
+            f'DROP TABLE IF EXISTS {self.name}'
+        ]
+
+    def rebuild_sql(self):
+        columns = ', '.join(self.columns)
+        return [
+            f"INSERT INTO {self.name}({self.name}) VALUES ('delete-all')",
+            f'INSERT INTO {self.name}(rowid, {columns}) '
+            f"SELECT id, {self.values(self.source)} FROM {self.source}",
+        ]
+
+    def rank_sql(self):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return f'bm25({self.name}, {weights})'
+
+    def search(self, queryset, text):
+        """Оставляет в queryset найденные строки и сортирует их
+        по релевантности, лучшие первыми.
+
+        На других СУБД индекса нет, там каждое слово ищется через
+        icontains по тем же колонкам без ранжирования.
+        """
+        query = match_query(text)
+        if not query:
+            return queryset
+        if connection.vendor != 'sqlite':
+            for token in tokenize(text):
+                condition = Q()
+                for column in self.columns:
+                    condition |= Q(
+                        **{f'{column}__icontains': stem(token)}
+                    )
+                queryset = queryset.filter(condition)
+            return queryset
+        return queryset.extra(
+            select={'search_rank': self.rank_sql()},
+            tables=[self.name],
+            where=[
+                f'{self.name}.rowid = {self.source}.id',
+                f'{self.name} MATCH %s',
+            ],
+            params=[query],
+        ).order_by('search_rank', 'id')
+
+
+TITLE_INDEX = FtsIndex(
+    name='search_title_fts',
+    source='reviews_title',
+    columns=('name', 'description'),
+    weights=(10.0, 1.0),
+)
+
+REVIEW_INDEX = FtsIndex(
+    name='search_review_fts',
+    source='reviews_review',
+    columns=('text',),
+    weights=(1.0,),
+)
+
+COMMENT_INDEX = FtsIndex(
+    name='search_comment_fts',
+    source='reviews_comment',
+    columns=('text',),
+    weights=(1.0,),
+)
@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from search.fts import COMMENT_INDEX, REVIEW_INDEX, TITLE_INDEX
+
+INDEXES = {
+    'title': TITLE_INDEX,
+    'review': REVIEW_INDEX,
+    'comment': COMMENT_INDEX,
+}
+
+
+class Command(BaseCommand):
+    """Заново заполняет полнотекстовые индексы из исходных таблиц
+    и пересоздает триггеры, если их удалила перестройка таблицы."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes',
+            nargs='*',
+            help=f'Какие индексы перестроить: {", ".join(sorted(INDEXES))}. '
+                 f'По умолчанию все.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Полнотекстовый индекс поддерживается только в SQLite.'
+            )
+        unknown = set(options['indexes']) - set(INDEXES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные индексы: {", ".join(sorted(unknown))}.'
+            )
+        for name in options['indexes'] or sorted(INDEXES):
+            with transaction.atomic(), connection.cursor() as cursor:
+                for sql in INDEXES[name].restore_sql():
+                    cursor.execute(sql)
+            self.stdout.write(f'Индекс {name} перестроен.')
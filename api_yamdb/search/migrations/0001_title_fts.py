@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from search.fts import TITLE_INDEX
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_review_comment_ordering'),
+    ]
+
+    operations = [
+        TITLE_INDEX.migration(),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from search.fts import COMMENT_INDEX, REVIEW_INDEX
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_title_fts'),
+    ]
+
+    operations = [
+        REVIEW_INDEX.migration(),
+        COMMENT_INDEX.migration(),
+    ]
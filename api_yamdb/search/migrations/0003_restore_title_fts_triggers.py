@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from search.fts import TITLE_INDEX
+
+
+class Migration(migrations.Migration):
+    """0006_title_name_key пересоздает reviews_title и удаляет
+    триггеры индекса произведений."""
+
+    dependencies = [
+        ('reviews', '0006_title_name_key'),
+        ('search', '0002_review_comment_fts'),
+    ]
+
+    operations = [
+        TITLE_INDEX.restore_migration(),
+    ]
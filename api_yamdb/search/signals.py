@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.models import Review, Title
+from .suggest import title_suggest_index
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: title_suggest_index.add(instance))
+
+
+@receiver(post_delete, sender=Title)
+def title_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: title_suggest_index.remove(pk))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    title_id = instance.title_id
+    transaction.on_commit(
+        lambda: title_suggest_index.refresh_scores(title_id)
+    )
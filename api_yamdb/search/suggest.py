@@ -0,0 +1,195 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DatabaseError, connection
+
+from reviews.models import Title, normalize_name, prefix_upper_bound
+from reviews.versions import TITLE_NAMES
+
+# Ключи обрезаются до этой длины, чтобы память индекса не росла
+# с длиной названий. Более длинный префикс дочитывается по name_key.
+KEY_LENGTH = 24
+# Через столько секунд индекс перестраивается, даже если названия
+# не менялись: так в другие процессы попадают новые рейтинги.
+MAX_AGE = 300
+
+rebuild_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='suggest-rebuild'
+)
+
+
+def word_keys(name_key):
+    """Ключи для каждого слова названия: "ежик в тумане" дает
+    "ежик в тумане", "в тумане" и "тумане"."""
+    keys = {name_key[:KEY_LENGTH]}
+    for index, char in enumerate(name_key):
+        if char == ' ':
+            keys.add(name_key[index + 1:index + 1 + KEY_LENGTH])
+    return keys
+
+
+class TitleSuggestIndex:
+    """Префиксный индекс названий произведений в памяти процесса.
+
+    Вместо дерева узлов хранится отсортированный список пар
+    (ключ, id): префикс превращается в диапазон через bisect, а каждая
+    запись стоит одну короткую строку. Для ранжирования у каждого
+    произведения хранятся название, рейтинг и число отзывов.
+
+    Изменения, сделанные в этом процессе, применяются сразу через
+    сигналы. Другие процессы узнают о новых и удаленных названиях
+    по VersionFile. Устаревший индекс перестраивается в фоне, а запросы
+    до конца перестройки отвечают по прежнему снимку; синхронно индекс
+    строится, только если его еще нет.
+    """
+    orderings = {
+        'rating': lambda title: (
+            title[1] is not None, title[1] or 0, title[2]
+        ),
+        'popularity': lambda title: (title[2], title[1] or 0),
+    }
+
+    def __init__(self, version):
+        self.version = version
+        self.lock = threading.RLock()
+        self.entries = []
+        self.titles = {}
+        self.seen_version = None
+        self.built_at = None
+        self.rebuilding = None
+
+    def build(self):
+        seen_version = self.version.current()
+        titles = {}
+        entries = []
+        rows = Title.objects.order_by().values_list(
+            'id', 'name', 'name_key', 'rating', 'review_count'
+        ).iterator()
+        for pk, name, name_key, rating, review_count in rows:
+            titles[pk] = (name, rating, review_count)
+            entries.extend((key, pk) for key in word_keys(name_key))
+        entries.sort()
+        with self.lock:
+            self.entries = entries
+            self.titles = titles
+            self.seen_version = seen_version
+            self.built_at = time.monotonic()
+
+    def warm_up(self):
+        """Строит индекс при старте процесса. Если БД еще не готова,
+        индекс построится на первом запросе."""
+        try:
+            self.build()
+        except DatabaseError:
+            pass
+
+    def ensure_fresh(self):
+        if self.built_at is None:
+            self.build()
+            return
+        if (time.monotonic() - self.built_at <= MAX_AGE
+                and self.version.current() == self.seen_version):
+            return
+        with self.lock:
+            if self.rebuilding is None or self.rebuilding.done():
+                self.rebuilding = rebuild_executor.submit(
+                    self.rebuild_in_background
+                )
+
+    def rebuild_in_background(self):
+        try:
+            self.build()
+        finally:
+            connection.close()
+
+    def wait_rebuild(self, timeout=None):
+        """Ждет окончания фоновой перестройки, если она идет."""
+        rebuilding = self.rebuilding
+        if rebuilding is not None:
+            rebuilding.result(timeout)
+
+    def suggest(self, prefix, limit=10, order='rating'):
+        self.ensure_fresh()
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        key = prefix[:KEY_LENGTH]
+        upper = prefix_upper_bound(key)
+        with self.lock:
+            start = bisect_left(self.entries, (key,))
+            end = (
+                len(self.entries) if upper is None
+                else bisect_left(self.entries, (upper,))
+            )
+            found = {pk for _, pk in self.entries[start:end]}
+            if len(prefix) > KEY_LENGTH:
+                found = {
+                    pk for pk in found
+                    if f' {prefix}' in f' {normalize_name(self.titles[pk][0])}'
+                }
+            ordering = self.orderings[order]
+            best = heapq.nlargest(
+                limit, found,
+                key=lambda pk: (ordering(self.titles[pk]), -pk)
+            )
+            return [
+                {
+                    'id': pk,
+                    'name': self.titles[pk][0],
+                    'rating': self.titles[pk][1],
+                }
+                for pk in best
+            ]
+
+    def add(self, title):
+        with self.lock:
+            self.discard(title.pk)
+            self.titles[title.pk] = (
+                title.name, title.rating, title.review_count
+            )
+            for key in word_keys(title.name_key):
+                insort(self.entries, (key, title.pk))
+            self.mark_changed()
+
+    def remove(self, pk):
+        with self.lock:
+            self.discard(pk)
+            self.mark_changed()
+
+    def mark_changed(self):
+        """Поднимает версию после изменения в этом процессе.
+
+        Если версию до этого поднял другой процесс, seen_version
+        остается прежним, и его изменения попадут в индекс при
+        следующей перестройке.
+        """
+        in_sync = self.version.current() == self.seen_version
+        version = self.version.bump()
+        if in_sync:
+            self.seen_version = version
+
+    def discard(self, pk):
+        title = self.titles.pop(pk, None)
+        if title is None:
+            return
+        for key in word_keys(normalize_name(title[0])):
+            index = bisect_left(self.entries, (key, pk))
+            if index < len(self.entries) and self.entries[index] == (
+                key, pk
+            ):
+                del self.entries[index]
+
+    def refresh_scores(self, pk):
+        values = Title.objects.filter(pk=pk).values_list(
+            'rating', 'review_count'
+        ).first()
+        with self.lock:
+            if values is None or pk not in self.titles:
+                return
+            self.titles[pk] = (self.titles[pk][0], *values)
+
+
+title_suggest_index = TitleSuggestIndex(TITLE_NAMES)
@@ -0,0 +1,97 @@
+import pytest
+
+from reviews.models import Review, Title
+from tests.utils import create_reviews
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    def test_01_rating_follows_reviews(self, admin_client, admin,
+                                       user_client, user, moderator_client,
+                                       moderator):
+        authors_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client,
+        }
+        reviews, titles = create_reviews(admin_client, authors_map)
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.score_sum, title.review_count, title.rating) == (
+            15, 3, 5
+        ), (
+            'Проверьте, что при создании отзыва у произведения обновляются '
+            'сумма оценок, количество отзывов и рейтинг.'
+        )
+
+        response = user_client.patch(
+            f'/api/v1/titles/{title.id}/reviews/{reviews[1]["id"]}/',
+            data={'score': 8}
+        )
+        assert response.status_code == 200
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count, title.rating) == (
+            18, 3, 6
+        ), (
+            'Проверьте, что при изменении оценки в отзыве рейтинг '
+            'произведения пересчитывается.'
+        )
+
+        Review.objects.get(id=reviews[0]['id']).delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count, title.rating) == (
+            13, 2, 6.5
+        ), (
+            'Проверьте, что при удалении отзыва рейтинг произведения '
+            'пересчитывается.'
+        )
+
+        user.delete()
+        moderator.delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count, title.rating) == (
+            0, 0, None
+        ), (
+            'Проверьте, что при каскадном удалении отзывов вместе с автором '
+            'рейтинг произведения пересчитывается.'
+        )
+
+    def test_02_rating_in_title_response(self, admin_client, admin,
+                                         user_client, user):
+        authors_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, authors_map)
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') == 5, (
+            'Проверьте, что в ответе на GET-запрос к '
+            '`/api/v1/titles/{title_id}/` возвращается сохраненный рейтинг.'
+        )
+
+    def test_03_overlapping_writes(self, user, admin):
+        title = Title.objects.create(name='Сталкер', year=1979)
+        review = Review.objects.create(title=title, author=user, text='.',
+                                       score=5)
+        first = Review.objects.get(id=review.id)
+        second = Review.objects.get(id=review.id)
+        first.score = 8
+        first.save()
+        second.score = 7
+        second.save()
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count, title.rating) == (
+            7, 1, 7
+        ), (
+            'Проверьте, что сохранение двух экземпляров одного отзыва '
+            'не портит рейтинг произведения.'
+        )
+
+        Review.objects.create(title=title, author=admin, text='.', score=9)
+        first, second = (Review.objects.get(id=review.id) for _ in range(2))
+        first.delete()
+        second.delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count, title.rating) == (
+            9, 1, 9
+        ), (
+            'Проверьте, что повторное удаление одного отзыва не портит '
+            'рейтинг произведения.'
+        )
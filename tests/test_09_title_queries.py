@@ -0,0 +1,88 @@
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title
+
+
+def create_catalog(size, start=0):
+    category, _ = Category.objects.get_or_create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.get_or_create(name='Ужасы', slug='horror')[0],
+        Genre.objects.get_or_create(name='Комедия', slug='comedy')[0],
+    ]
+    for idx in range(start, start + size):
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category
+        )
+        title.genre.set(genres)
+
+
+def count_queries(client, url):
+    # Прогревочный запрос загружает кэш справочников, который
+    # читается из БД один раз на процесс, а кэш ответов
+    # очищается, чтобы считать запросы самого вьюсета.
+    client.get(url)
+    caches[settings.RESPONSE_CACHE_ALIAS].clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09TitleQueries:
+
+    def test_01_title_list_queries_do_not_grow(self, client):
+        create_catalog(1)
+        small_page = count_queries(client, '/api/v1/titles/')
+        create_catalog(11, start=1)
+        full_page = count_queries(client, '/api/v1/titles/')
+        assert small_page <= 3 and full_page == small_page, (
+            'Проверьте, что количество запросов к БД при GET-запросе к '
+            '`/api/v1/titles/` не зависит от количества произведений '
+            'на странице.'
+        )
+
+    def test_02_title_detail_queries(self, client):
+        create_catalog(1)
+        title = Title.objects.get()
+        assert count_queries(client, f'/api/v1/titles/{title.id}/') <= 2, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/{title_id}/` '
+            'выполняется за фиксированное количество запросов к БД.'
+        )
+
+    def test_03_name_prefix_filter_uses_index(self, client):
+        category = Category.objects.create(name='Фильм', slug='films')
+        for name in ('Ёжик в тумане', 'Ежи и Ко', 'Крёстный отец',
+                     'Крестоносцы', 'Жизнь', 'Жизнь\U0010ffff',
+                     '\U0010ffff\U0010ffff', 'Жизнь\ud7ff'):
+            Title.objects.create(name=name, year=2000, category=category)
+        for prefix, expected in (
+            ('ЕЖ', {'Ёжик в тумане', 'Ежи и Ко'}),
+            ('крёст', {'Крёстный отец', 'Крестоносцы'}),
+            ('крестный  о', {'Крёстный отец'}),
+            ('жизнь\U0010ffff', {'Жизнь\U0010ffff'}),
+            ('\U0010ffff', {'\U0010ffff\U0010ffff'}),
+            ('жизнь\ud7ff', {'Жизнь\ud7ff'}),
+        ):
+            response = client.get('/api/v1/titles/', {'name': prefix})
+            assert response.status_code == 200
+            names = {title['name'] for title in response.json()['results']}
+            assert names == expected, (
+                'Проверьте, что фильтр `name` на `/api/v1/titles/` ищет '
+                'по началу названия без учета регистра и разницы е/ё.'
+            )
+
+        queryset = Title.objects.filter(
+            name_key__gte='ез', name_key__lt='еи'
+        )
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        assert 'name_key' in plan, (
+            'Проверьте, что фильтр по началу названия использует индекс.'
+        )
@@ -0,0 +1,251 @@
+import csv
+import gzip
+import json
+import os
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Avg
+
+from reviews.management.commands.import_csv import IdMap
+from reviews.models import Category, Comment, Genre, Review, Title, TitleGenre
+from tests.conftest import MANAGE_PATH
+from users.models import User
+
+DATA_DIR = os.path.join(MANAGE_PATH, 'static', 'data')
+FILES = (
+    ('category', Category),
+    ('genre', Genre),
+    ('users', User),
+    ('titles', Title),
+    ('genre_title', TitleGenre),
+    ('review', Review),
+    ('comments', Comment),
+)
+
+
+def read_ids(name):
+    with open(os.path.join(DATA_DIR, f'{name}.csv'), encoding='utf8',
+              newline='') as csv_file:
+        return [int(row['id']) for row in csv.DictReader(csv_file)]
+
+
+def count_rows(name):
+    return len(read_ids(name))
+
+
+def copy_data(data_dir):
+    for name, _ in FILES:
+        with open(os.path.join(DATA_DIR, f'{name}.csv'),
+                  encoding='utf8') as source:
+            (data_dir / f'{name}.csv').write_text(
+                source.read(), encoding='utf8'
+            )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ImportCsv:
+
+    def test_01_import_all_tables(self):
+        out = StringIO()
+        call_command('import_csv', batch_size=7, stdout=out)
+        assert out.getvalue().count('строк/с') == len(FILES), (
+            'Проверьте, что команда `import_csv` сообщает скорость '
+            'загрузки каждого файла.'
+        )
+        for name, model in FILES:
+            assert model.objects.count() == count_rows(name), (
+                f'Проверьте, что команда `import_csv` загружает все строки '
+                f'из файла `{name}.csv`.'
+            )
+        assert not Title.objects.filter(name_key='').exists(), (
+            'Проверьте, что `import_csv` заполняет нормализованное '
+            'название произведения.'
+        )
+        for title in Title.objects.all():
+            expected = title.reviews.aggregate(Avg('score'))['score__avg']
+            assert title.rating == expected, (
+                'Проверьте, что после загрузки отзывов командой `import_csv` '
+                'рейтинг произведений пересчитывается.'
+            )
+
+    def test_02_stream_resume(self, tmp_path):
+        checkpoint = tmp_path / 'import.checkpoint'
+        out = StringIO()
+        call_command('import_csv', stream=True, batch_size=10,
+                     checkpoint=str(checkpoint), stdout=out)
+        assert not checkpoint.exists(), (
+            'Проверьте, что после успешной загрузки в режиме `--stream` '
+            'файл контрольной точки удаляется.'
+        )
+
+        # Имитируем сбой: загружено только 40 отзывов и ни одного
+        # комментария.
+        Comment.objects.all().delete()
+        Review.objects.filter(id__in=read_ids('review')[40:]).delete()
+        checkpoint.write_text(json.dumps({'table': 'review', 'row': 40}))
+
+        call_command('import_csv', resume=True, batch_size=10,
+                     checkpoint=str(checkpoint), stdout=out)
+        assert Review.objects.count() == count_rows('review'), (
+            'Проверьте, что `import_csv --resume` догружает отзывы '
+            'с последней контрольной точки.'
+        )
+        assert Comment.objects.count() == count_rows('comments'), (
+            'Проверьте, что `import_csv --resume` загружает таблицы, '
+            'следующие за таблицей из контрольной точки.'
+        )
+        assert not checkpoint.exists()
+
+        # Сбой между фиксацией пачки и сохранением контрольной точки:
+        # отзывы 40-49 уже в БД, а контрольная точка осталась на 40.
+        Comment.objects.all().delete()
+        Review.objects.filter(id__in=read_ids('review')[50:]).delete()
+        checkpoint.write_text(json.dumps({'table': 'review', 'row': 40}))
+        call_command('import_csv', resume=True, batch_size=10,
+                     checkpoint=str(checkpoint), stdout=out)
+        assert Review.objects.count() == count_rows('review'), (
+            'Проверьте, что `import_csv --resume` пропускает строки, '
+            'загруженные после последней контрольной точки.'
+        )
+        assert Comment.objects.count() == count_rows('comments')
+
+    def test_03_parallel_import(self):
+        out = StringIO()
+        call_command('import_csv', workers=4, stdout=out)
+        for name, model in FILES:
+            assert model.objects.count() == count_rows(name), (
+                f'Проверьте, что команда `import_csv --workers` загружает '
+                f'все строки из файла `{name}.csv`.'
+            )
+        assert Title.objects.filter(rating__isnull=False).exists(), (
+            'Проверьте, что после загрузки `import_csv --workers` '
+            'рейтинг произведений пересчитывается.'
+        )
+
+    def test_04_fast_import(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys')
+            foreign_keys = cursor.fetchone()[0]
+        call_command('import_csv', fast=True, stdout=StringIO())
+        for name, model in FILES:
+            assert model.objects.count() == count_rows(name), (
+                f'Проверьте, что команда `import_csv --fast` загружает '
+                f'все строки из файла `{name}.csv`.'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys')
+            assert cursor.fetchone()[0] == foreign_keys, (
+                'Проверьте, что после `import_csv --fast` настройки SQLite '
+                'возвращаются к исходным.'
+            )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'year_idx'"
+            )
+            assert cursor.fetchone(), (
+                'Проверьте, что после `import_csv --fast` индексы '
+                'создаются заново.'
+            )
+        assert Review.objects.filter(pub_date__year=2019).exists(), (
+            'Проверьте, что `import_csv --fast` сохраняет даты публикации '
+            'из csv-файла.'
+        )
+
+    def test_05_fast_import_checks_foreign_keys(self, tmp_path):
+        copy_data(tmp_path)
+        with open(tmp_path / 'genre_title.csv', 'a',
+                  encoding='utf8') as csv_file:
+            csv_file.write('\n1000,1,999\n')
+        with pytest.raises(CommandError):
+            call_command('import_csv', fast=True, data_dir=str(tmp_path),
+                         stdout=StringIO())
+        assert not Title.objects.exists(), (
+            'Проверьте, что `import_csv --fast` откатывает загрузку, если '
+            'в данных есть ссылки на несуществующие записи.'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'year_idx'"
+            )
+            assert cursor.fetchone(), (
+                'Проверьте, что при откате `import_csv --fast` удаленные '
+                'индексы возвращаются вместе с данными.'
+            )
+
+    def test_06_export_round_trip(self, tmp_path):
+        call_command('import_csv', stdout=StringIO())
+        Title.objects.filter(id=1).update(category=None, description='Текст')
+        export_dir = tmp_path / 'export'
+        call_command('export_csv', str(export_dir), chunk_size=5,
+                     stdout=StringIO())
+        for name, model in FILES:
+            with open(export_dir / f'{name}.csv', encoding='utf8',
+                      newline='') as csv_file:
+                assert sum(1 for _ in csv.DictReader(csv_file)) == (
+                    model.objects.count()
+                ), (
+                    f'Проверьте, что команда `export_csv` выгружает все '
+                    f'строки таблицы в файл `{name}.csv`.'
+                )
+
+        expected = list(Review.objects.order_by('id').values_list(
+            'id', 'title_id', 'author_id', 'score', 'pub_date'
+        ))
+        assert expected[0][-1].year == 2019, (
+            'Проверьте, что `import_csv` сохраняет даты публикации '
+            'из csv-файла.'
+        )
+        for options in ({}, {'fast': True}, {'workers': 2},
+                        {'stream': True,
+                         'checkpoint': str(tmp_path / 'checkpoint')}):
+            for model in reversed([model for _, model in FILES]):
+                model.objects.all().delete()
+            call_command('import_csv', data_dir=str(export_dir),
+                         stdout=StringIO(), **options)
+            assert list(Review.objects.order_by('id').values_list(
+                'id', 'title_id', 'author_id', 'score', 'pub_date'
+            )) == expected, (
+                'Проверьте, что файлы, выгруженные `export_csv`, '
+                f'загружаются командой `import_csv` с {options} без потерь.'
+            )
+            assert Comment.objects.filter(pub_date__year=2020).exists()
+            title = Title.objects.get(id=1)
+            assert (title.category, title.description) == (None, 'Текст')
+
+    def test_07_export_ndjson_gzip(self, tmp_path):
+        call_command('import_csv', stdout=StringIO())
+        call_command('export_csv', str(tmp_path), ndjson=True, gzip=True,
+                     stdout=StringIO())
+        with gzip.open(tmp_path / 'review.ndjson.gz', 'rt',
+                       encoding='utf8') as ndjson_file:
+            rows = [json.loads(line) for line in ndjson_file]
+        assert len(rows) == Review.objects.count()
+        assert set(rows[0]) == {
+            'id', 'title_id', 'text', 'author', 'score', 'pub_date'
+        }, (
+            'Проверьте, что `export_csv --ndjson` использует те же имена '
+            'полей, что и csv-файлы.'
+        )
+
+    def test_08_stream_checks_foreign_keys(self, tmp_path, monkeypatch):
+        copy_data(tmp_path)
+        with open(tmp_path / 'review.csv', 'a',
+                  encoding='utf8') as csv_file:
+            csv_file.write('\n1000,1,.,999,5,2020-01-01T00:00:00Z\n')
+
+        def load_all_ids(self, model):
+            raise AssertionError
+
+        # В режиме --stream id загруженных таблиц не держатся в памяти.
+        monkeypatch.setattr(IdMap, '__getitem__', load_all_ids)
+        with pytest.raises(CommandError, match='999'):
+            call_command('import_csv', stream=True, batch_size=10,
+                         data_dir=str(tmp_path),
+                         checkpoint=str(tmp_path / 'checkpoint'),
+                         stdout=StringIO())
+        assert Review.objects.count() == count_rows('review') // 10 * 10, (
+            'Проверьте, что `import_csv --stream` проверяет внешние ключи '
+            'каждой пачки и останавливается на пачке с ошибкой.'
+        )
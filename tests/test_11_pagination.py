@@ -0,0 +1,159 @@
+import json
+from base64 import urlsafe_b64encode
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reviews.models import Category, Review, Title
+
+
+def walk(client, url, link='next'):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        page = [item['id'] for item in data['results']]
+        ids.extend(page if link == 'next' else reversed(page))
+        url = data[link]
+        last = data
+    return ids, last
+
+
+def encode_cursor(position):
+    return urlsafe_b64encode(
+        json.dumps({'p': position, 'r': 0}).encode('utf8')
+    ).decode('ascii')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11CursorPagination:
+
+    def test_01_reviews_cursor_walk(self, client, django_user_model):
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Фильм', year=2000,
+                                     category=category)
+        pub_date = timezone.now()
+        for idx in range(12):
+            author = django_user_model.objects.create_user(
+                username=f'author{idx}', email=f'author{idx}@yamdb.fake'
+            )
+            review = Review.objects.create(
+                title=title, author=author, text='text', score=5
+            )
+        # Одинаковая дата у всех отзывов: порядок должен держаться на id.
+        Review.objects.update(pub_date=pub_date)
+        expected = list(
+            Review.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        ids, last_page = walk(client, url)
+        assert ids == expected, (
+            f'Проверьте, что пагинация курсором на `{url}` проходит все '
+            'отзывы без пропусков и повторов, даже при одинаковой дате '
+            'публикации.'
+        )
+        assert last_page['next'] is None
+
+        ids, first_page = walk(client, last_page['previous'], 'previous')
+        assert ids == list(reversed(expected[:-2])), (
+            f'Проверьте, что ссылка `previous` на `{url}` ведет на '
+            'предыдущую страницу.'
+        )
+        assert first_page['previous'] is None
+        assert review.id == expected[0]
+
+    def test_02_invalid_cursor(self, client):
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Фильм', year=2000,
+                                     category=category)
+        for url, cursor in (
+            (f'/api/v1/titles/{title.id}/reviews/?', 'garbage'),
+            (f'/api/v1/titles/{title.id}/reviews/?',
+             'eyJwIjpbIngiLCIxIl0sInIiOjB9'),
+            (f'/api/v1/titles/{title.id}/reviews/?',
+             encode_cursor(['2020-01-01T00:00:00+00:00', 10 ** 30])),
+            ('/api/v1/titles/?pagination=cursor&',
+             encode_cursor([10 ** 30, 1])),
+        ):
+            response = client.get(f'{url}cursor={cursor}')
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что при некорректном курсоре возвращается '
+                'ответ со статусом 404.'
+            )
+
+    def test_03_titles_keyset_walk(self, client):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        for idx in range(14):
+            Title.objects.create(
+                name=f'Произведение {idx}', year=1990 + idx % 3,
+                category=films if idx % 2 else books
+            )
+        url = '/api/v1/titles/?pagination=cursor&category=films'
+        ids, last_page = walk(client, url)
+        expected = list(
+            Title.objects.filter(category=films).order_by(
+                'year', 'id'
+            ).values_list('id', flat=True)
+        )
+        assert ids == expected, (
+            'Проверьте, что пагинация курсором на `/api/v1/titles/` '
+            'проходит отфильтрованный каталог по (year, id) без пропусков '
+            'и повторов.'
+        )
+        assert 'count' not in last_page
+
+        response = client.get('/api/v1/titles/?pagination=unknown')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == 14, (
+            'Проверьте, что без параметра `pagination` каталог '
+            'выводится постранично с ключом `count`.'
+        )
+
+    def test_04_count_free_pages(self, client):
+        cache.clear()
+        for idx in range(7):
+            Category.objects.create(name=f'Категория {idx}', slug=f'c{idx}')
+        url = '/api/v1/categories/?pagination=nocount'
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        data = response.json()
+        assert not any(
+            'COUNT(' in query['sql'].upper()
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что в режиме `pagination=nocount` не выполняется '
+            'запрос COUNT(*).'
+        )
+        assert 'count' not in data and len(data['results']) == 5
+        assert data['previous'] is None and data['next'], (
+            'Проверьте, что в режиме `pagination=nocount` ссылка `next` '
+            'есть, если есть следующая страница.'
+        )
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 2 and data['next'] is None
+        assert data['previous']
+
+        response = client.get(url + '&count=cached')
+        assert response.json()['count'] == 7
+        Category.objects.create(name='Новая', slug='new')
+        response = client.get(url + '&count=cached')
+        assert response.json()['count'] == 7, (
+            'Проверьте, что с параметром `count=cached` количество '
+            'берется из кэша.'
+        )
+        for page in ('10', '0', '99999999999999999999'):
+            response = client.get(url + f'&page={page}')
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что в режиме `pagination=nocount` на номер '
+                'несуществующей страницы возвращается 404.'
+            )
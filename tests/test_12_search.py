@@ -0,0 +1,172 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from reviews.models import Category, Comment, Review, Title
+
+
+def search(client, text):
+    response = client.get('/api/v1/titles/', {'search': text})
+    assert response.status_code == HTTPStatus.OK
+    return [title['name'] for title in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12TitleSearch:
+
+    def test_01_title_search(self, client):
+        category = Category.objects.create(name='Фильм', slug='films')
+        Title.objects.create(
+            name='Ёжик в тумане', year=1975, category=category,
+            description='Мультфильм про ежика и лошадку.'
+        )
+        Title.objects.create(
+            name='Туманность Андромеды', year=1967, category=category,
+            description='Фантастика.'
+        )
+        Title.objects.create(
+            name='Солярис', year=1972, category=category,
+            description='Океан и туман памяти.'
+        )
+        assert search(client, 'ежик') == ['Ёжик в тумане'], (
+            'Проверьте, что поиск `search=` на `/api/v1/titles/` находит '
+            'произведения по словам из названия, не различая е и ё.'
+        )
+        found = search(client, 'туман')
+        assert len(found) == 3 and found[-1] == 'Солярис', (
+            'Проверьте, что совпадения в названии ранжируются выше '
+            'совпадений в описании.'
+        )
+        assert search(client, 'океан памяти') == ['Солярис'], (
+            'Проверьте, что поиск `search=` находит слова из середины '
+            'описания.'
+        )
+        assert search(client, '"* -') == [
+            'Туманность Андромеды', 'Солярис', 'Ёжик в тумане'
+        ], (
+            'Проверьте, что запрос без слов не фильтрует каталог.'
+        )
+
+    def test_02_index_follows_changes(self, client):
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Сталкер', year=1979,
+                                     category=category)
+        assert search(client, 'сталкер') == ['Сталкер']
+        title.name = 'Зеркало'
+        title.save()
+        assert search(client, 'сталкер') == [], (
+            'Проверьте, что при изменении произведения поисковый индекс '
+            'обновляется.'
+        )
+        assert search(client, 'зеркало') == ['Зеркало']
+        title.delete()
+        assert search(client, 'зеркало') == [], (
+            'Проверьте, что при удалении произведения оно пропадает '
+            'из поискового индекса.'
+        )
+
+        Title.objects.bulk_create([
+            Title(name='Андрей Рублев', year=1966, category=category)
+        ])
+        call_command('rebuild_search_index', stdout=None)
+        assert search(client, 'рублев') == ['Андрей Рублев']
+
+    def test_03_triggers_survive_table_rebuild(self, client):
+        # Откат и повтор миграции пересоздают таблицу произведений.
+        call_command('migrate', 'reviews', '0005', verbosity=0)
+        call_command('migrate', verbosity=0)
+        Title.objects.create(name='Сталкер', year=1979)
+        assert search(client, 'сталкер') == ['Сталкер'], (
+            'Проверьте, что после миграций, пересоздающих таблицу '
+            'произведений, поисковый индекс обновляется триггерами.'
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER search_title_fts_ai')
+        call_command('rebuild_search_index', 'title', stdout=None)
+        Title.objects.create(name='Солярис', year=1972)
+        assert search(client, 'солярис') == ['Солярис'], (
+            'Проверьте, что `rebuild_search_index` восстанавливает '
+            'удаленные триггеры индекса.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12ReviewCommentSearch:
+
+    def test_01_review_and_comment_search(self, user_client, user,
+                                          moderator_client, moderator,
+                                          admin):
+        category = Category.objects.create(name='Фильм', slug='films')
+        solaris = Title.objects.create(name='Солярис', year=1972,
+                                       category=category)
+        stalker = Title.objects.create(name='Сталкер', year=1979,
+                                       category=category)
+        first = Review.objects.create(
+            title=solaris, author=user, score=9,
+            text='Великий фильм о памяти и совести.'
+        )
+        Review.objects.create(
+            title=stalker, author=user, score=8,
+            text='Фильмы Тарковского нужно смотреть медленно.'
+        )
+        Review.objects.create(
+            title=stalker, author=admin, score=3,
+            text='Слишком медленно, уснул.'
+        )
+        Comment.objects.create(
+            review=first, author=admin, text='Согласен, о совести.'
+        )
+
+        url = '/api/v1/search/reviews/'
+        response = user_client.get(url, {'search': 'фильм'})
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что поиск `{url}` недоступен обычному '
+            'пользователю.'
+        )
+        response = moderator_client.get(url, {'search': 'фильмов'})
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['count'] == 2, (
+            f'Проверьте, что поиск `{url}` находит разные формы '
+            'русского слова.'
+        )
+        response = moderator_client.get(
+            url, {'search': 'медленно', 'author': admin.username}
+        )
+        assert [review['text'] for review in response.json()['results']] == [
+            'Слишком медленно, уснул.'
+        ], f'Проверьте, что поиск `{url}` фильтрует по автору.'
+        response = moderator_client.get(
+            url, {'search': 'медленно', 'title': solaris.id}
+        )
+        assert response.json()['count'] == 0, (
+            f'Проверьте, что поиск `{url}` фильтрует по произведению.'
+        )
+        response = moderator_client.get(
+            url, {'search': 'медленно', 'date_from': '2100-01-01T00:00:00'}
+        )
+        assert response.json()['count'] == 0, (
+            f'Проверьте, что поиск `{url}` фильтрует по дате публикации.'
+        )
+
+        response = moderator_client.get(
+            '/api/v1/search/comments/', {'search': 'совесть'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert [
+            comment['text'] for comment in response.json()['results']
+        ] == ['Согласен, о совести.'], (
+            'Проверьте, что поиск `/api/v1/search/comments/` находит '
+            'комментарии по тексту.'
+        )
+
+        first.delete()
+        response = moderator_client.get(
+            '/api/v1/search/comments/', {'search': 'совести'}
+        )
+        assert response.json()['count'] == 0, (
+            'Проверьте, что удаленные комментарии пропадают из поиска.'
+        )
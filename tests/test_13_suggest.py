@@ -0,0 +1,127 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Review, Title
+from reviews.versions import VersionFile
+from search.suggest import title_suggest_index
+
+
+def suggest(client, **params):
+    response = client.get('/api/v1/titles/suggest/', params)
+    assert response.status_code == HTTPStatus.OK, (
+        'Проверьте, что эндпоинт `/api/v1/titles/suggest/` доступен '
+        'без токена.'
+    )
+    return [title['name'] for title in response.json()]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13TitleSuggest:
+
+    def test_01_suggest(self, client, settings, tmp_path, user, admin):
+        settings.VERSION_FILES_DIR = tmp_path
+        category = Category.objects.create(name='Фильм', slug='films')
+        hedgehog = Title.objects.create(name='Ёжик в тумане', year=1975,
+                                        category=category)
+        nebula = Title.objects.create(name='Туманность Андромеды',
+                                      year=1967, category=category)
+        Title.objects.create(name='Солярис', year=1972, category=category)
+        title_suggest_index.build()
+
+        Review.objects.create(title=nebula, author=user, text='.', score=9)
+        Review.objects.create(title=hedgehog, author=user, text='.',
+                              score=5)
+        Review.objects.create(title=hedgehog, author=admin, text='.',
+                              score=6)
+        with CaptureQueriesContext(connection) as context:
+            found = suggest(client, q='ТУМАН')
+        assert found == ['Туманность Андромеды', 'Ёжик в тумане'], (
+            'Проверьте, что `/api/v1/titles/suggest/` находит названия по '
+            'началу любого слова и сортирует их по рейтингу.'
+        )
+        assert not context.captured_queries, (
+            'Проверьте, что подсказки отдаются из индекса в памяти без '
+            'запросов к БД.'
+        )
+        assert suggest(client, q='туман', order='popularity') == [
+            'Ёжик в тумане', 'Туманность Андромеды'
+        ]
+        assert suggest(client, q='туман', limit=1) == [
+            'Туманность Андромеды'
+        ]
+
+        nebula.name = 'Андромеда'
+        nebula.save()
+        hedgehog.delete()
+        assert suggest(client, q='туман') == [], (
+            'Проверьте, что индекс подсказок обновляется при изменении и '
+            'удалении произведений.'
+        )
+        assert suggest(client, q='андр') == ['Андромеда']
+
+        response = client.get('/api/v1/titles/suggest/')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        Title.objects.create(name='Андромеда\U0010ffff', year=1967,
+                             category=category)
+        assert suggest(client, q='андромеда\U0010ffff') == [
+            'Андромеда\U0010ffff'
+        ], (
+            'Проверьте, что подсказки работают для префикса, '
+            'оканчивающегося символом U+10FFFF.'
+        )
+        assert suggest(client, q='\U0010ffff') == []
+
+    def test_02_rebuild_on_version_change(self, client, settings,
+                                          tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        category = Category.objects.create(name='Фильм', slug='films')
+        title_suggest_index.build()
+        # Другой процесс добавил произведение и поднял версию.
+        Title.objects.bulk_create([
+            Title(name='Сталкер', name_key='сталкер', year=1979,
+                  category=category)
+        ])
+        assert suggest(client, q='стал') == []
+        VersionFile('titles').bump()
+        with CaptureQueriesContext(connection) as context:
+            assert suggest(client, q='стал') == []
+        assert not context.captured_queries, (
+            'Проверьте, что устаревший индекс подсказок перестраивается '
+            'в фоне, а запрос отвечает по прежнему снимку.'
+        )
+        title_suggest_index.wait_rebuild()
+        assert suggest(client, q='стал') == ['Сталкер'], (
+            'Проверьте, что индекс подсказок перестраивается, когда '
+            'другой процесс меняет произведения.'
+        )
+
+        # Другой процесс поднял версию раньше, чем этот добавил название.
+        Title.objects.bulk_create([
+            Title(name='Солярис', name_key='солярис', year=1972,
+                  category=category)
+        ])
+        VersionFile('titles').bump()
+        Title.objects.create(name='Солнце', year=2000, category=category)
+        suggest(client, q='сол')
+        title_suggest_index.wait_rebuild()
+        assert set(suggest(client, q='сол')) == {'Солнце', 'Солярис'}, (
+            'Проверьте, что изменение в этом процессе не скрывает '
+            'изменения, сделанные другим процессом.'
+        )
+
+    def test_03_rebuild_after_import(self, client, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title_suggest_index.build()
+        call_command('import_csv', stdout=StringIO())
+        suggest(client, q='побег')
+        title_suggest_index.wait_rebuild()
+        assert suggest(client, q='побег') == ['Побег из Шоушенка'], (
+            'Проверьте, что после `import_csv` индекс подсказок '
+            'перестраивается.'
+        )
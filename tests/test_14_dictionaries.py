@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.dictionaries import category_cache, genre_cache
+from reviews.models import Category, Genre, Title
+from reviews.versions import VersionFile
+
+
+def post_title(client, category, genres):
+    return client.post('/api/v1/titles/', data={
+        'name': 'Сталкер', 'year': 1979, 'category': category,
+        'genre': genres,
+    })
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14DictionaryCache:
+
+    def test_01_slugs_resolved_from_cache(self, admin_client, client,
+                                          settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Фантастика', slug='sci-fi')
+        category_cache.get_by_slug('films')
+        genre_cache.get_by_slug('drama')
+
+        with CaptureQueriesContext(connection) as context:
+            response = post_title(admin_client, 'films', ['drama', 'sci-fi'])
+        assert response.status_code == HTTPStatus.CREATED
+        tables = ' '.join(query['sql'] for query in context.captured_queries
+                          if query['sql'].startswith('SELECT'))
+        assert 'reviews_category' not in tables, (
+            'Проверьте, что при создании произведения категория ищется '
+            'по slug в кэше справочника, а не в БД.'
+        )
+
+        response = client.get('/api/v1/titles/', {'genre': 'sci-fi'})
+        assert response.json()['results'][0]['genre'] == [
+            {'name': 'Драма', 'slug': 'drama'},
+            {'name': 'Фантастика', 'slug': 'sci-fi'},
+        ]
+        assert response.json()['results'][0]['category'] == {
+            'name': 'Фильм', 'slug': 'films'
+        }
+        response = client.get('/api/v1/titles/', {'category': 'unknown'})
+        assert response.json()['results'] == []
+
+    def test_02_invalidated_across_processes(self, admin_client, settings,
+                                             tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        Genre.objects.create(name='Драма', slug='drama')
+        genre_cache.get_by_slug('drama')
+        category_cache.get_by_slug('books')
+        # Другой процесс добавил категорию и поднял версию.
+        Category.objects.bulk_create([Category(name='Книга', slug='books')])
+        response = post_title(admin_client, 'books', ['drama'])
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        VersionFile(Category._meta.db_table).bump()
+        response = post_title(admin_client, 'books', ['drama'])
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что кэш справочника перечитывается, когда другой '
+            'процесс меняет категории или жанры.'
+        )
+
+        admin_client.delete('/api/v1/genres/drama/')
+        response = post_title(admin_client, 'books', ['drama'])
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что удаление жанра сбрасывает кэш справочника.'
+        )
+        assert Title.objects.count() == 1
@@ -0,0 +1,76 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title, TitleGenre
+
+
+def post_json(client, url, data):
+    return client.post(
+        url, data=json.dumps(data), content_type='application/json'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15BulkTitles:
+    url = '/api/v1/titles/bulk/'
+
+    def test_01_bulk_create(self, admin_client, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Комедия', slug='comedy')
+        Title.objects.create(name='Уже есть', year=1990)
+        items = [
+            {'name': f'Фильм {idx}', 'year': 2000, 'category': 'films',
+             'genre': ['drama', 'comedy']}
+            for idx in range(300)
+        ]
+        items[5]['genre'] = ['unknown']
+        items[7]['year'] = 3000
+        items.append('не словарь')
+
+        with CaptureQueriesContext(connection) as context:
+            response = post_json(admin_client, self.url, items)
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что POST-запрос администратора к '
+            '`/api/v1/titles/bulk/` создает произведения.'
+        )
+        data = response.json()
+        assert [error['index'] for error in data['errors']] == [5, 7, 300], (
+            'Проверьте, что ошибки возвращаются для каждого элемента '
+            'отдельно и не отменяют создание остальных.'
+        )
+        assert 'genre' in data['errors'][0]['errors']
+        assert len(data['created']) == 298
+        assert len(context.captured_queries) < 20, (
+            'Проверьте, что произведения и связи с жанрами создаются '
+            'массовой вставкой, а не по одному.'
+        )
+
+        created = {item['index']: item['id'] for item in data['created']}
+        title = Title.objects.get(pk=created[42])
+        assert title.name == 'Фильм 42'
+        assert title.name_key == 'фильм 42'
+        assert title.category.slug == 'films'
+        assert {genre.slug for genre in title.genre.all()} == {
+            'drama', 'comedy'
+        }
+        assert TitleGenre.objects.count() == 298 * 2
+
+    def test_02_bulk_create_rejected(self, admin_client, user_client):
+        response = post_json(
+            user_client, self.url, [{'name': 'Фильм', 'year': 2000}]
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что создавать произведения списком может '
+            'только администратор.'
+        )
+        response = post_json(admin_client, self.url, {'name': 'Фильм'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        response = post_json(admin_client, self.url, [{'name': 'Фильм'}])
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert not Title.objects.exists()
@@ -0,0 +1,99 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Review, Title
+
+
+def create_titles(user, count):
+    category = Category.objects.create(name='Фильм', slug='films')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    titles = []
+    for idx in range(count):
+        title = Title.objects.create(
+            name=f'Фильм {idx}', year=2000, category=category
+        )
+        title.genre.set([genre])
+        titles.append(title)
+    Review.objects.create(title=titles[0], author=user, text='.', score=7)
+    return titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16TitleBatch:
+
+    def test_01_batch_get(self, client, user, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        titles = create_titles(user, 10)
+        ids = [titles[3].id, titles[0].id, 100500, titles[3].id]
+        url = '/api/v1/titles/batch/'
+        client.get(url, {'ids': titles[0].id})
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {'ids': ','.join(map(str, ids))})
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что `/api/v1/titles/batch/?ids=` доступен без токена.'
+        )
+        data = response.json()
+        assert [title['id'] for title in data['results']] == ids[:2], (
+            'Проверьте, что `/api/v1/titles/batch/` возвращает произведения '
+            'в порядке запроса и без повторов.'
+        )
+        assert data['results'][1]['rating'] == 7
+        assert data['results'][1]['genre'] == [
+            {'name': 'Драма', 'slug': 'drama'}
+        ]
+        assert data['missing'] == [100500], (
+            'Проверьте, что ненайденные id перечислены в `missing`.'
+        )
+        assert len(context.captured_queries) <= 2, (
+            'Проверьте, что `/api/v1/titles/batch/` выполняет '
+            'фиксированное количество запросов к БД.'
+        )
+
+    def test_02_batch_get_validation(self, client, settings):
+        for url in ('/api/v1/titles/batch/', '/api/v1/titles/ratings/'):
+            for ids in ('', 'a,b', '1,0', '-1', str(2 ** 63),
+                        ','.join(map(str, range(
+                            1, settings.MAX_BATCH_IDS + 2
+                        )))):
+                response = client.get(url, {'ids': ids})
+                assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                    f'Проверьте, что `{url}` отклоняет пустой, '
+                    'некорректный или слишком длинный список id и id вне '
+                    'диапазона первичных ключей.'
+                )
+
+    def test_03_ratings(self, client, user, admin, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        titles = create_titles(user, 3)
+        url = '/api/v1/titles/ratings/'
+        ids = f'{titles[0].id},{titles[1].id},100500'
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {'ids': ids})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            str(titles[0].id): {'rating': 7.0, 'review_count': 1},
+            str(titles[1].id): {'rating': None, 'review_count': 0},
+        }, (
+            'Проверьте, что `/api/v1/titles/ratings/` возвращает рейтинг и '
+            'число отзывов для найденных произведений.'
+        )
+        assert len(context.captured_queries) == 1, (
+            'Проверьте, что `/api/v1/titles/ratings/` выполняет один '
+            'запрос к БД.'
+        )
+
+        etag = response['ETag']
+        response = client.get(url, {'ids': ids}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что при неизменных рейтингах и заголовке '
+            '`If-None-Match` возвращается 304.'
+        )
+        Review.objects.create(title=titles[1], author=admin, text='.',
+                              score=3)
+        response = client.get(url, {'ids': ids}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()[str(titles[1].id)]['rating'] == 3.0
+        assert response['ETag'] != etag
@@ -0,0 +1,97 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Review, Title
+
+
+def get(client, url, **extra):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, **extra)
+    assert response.status_code == HTTPStatus.OK
+    return response, len(context.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17ResponseCache:
+
+    def check_cache(self, client, admin, user):
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Сталкер', year=1979,
+                                     category=category)
+        url = f'/api/v1/titles/{title.id}/'
+        first, _ = get(client, url)
+        second, queries = get(client, url)
+        assert first['X-Cache'] == 'MISS' and second['X-Cache'] == 'HIT', (
+            'Проверьте, что анонимный GET-запрос к произведению '
+            'отдается из кэша ответов.'
+        )
+        assert queries == 0 and second.json() == first.json()
+        response, _ = get(client, url, HTTP_ACCEPT='text/html')
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что ключ кэша ответов учитывает заголовок Accept.'
+        )
+
+        Review.objects.create(title=title, author=user, text='.', score=8)
+        response, _ = get(client, url)
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что новый отзыв сбрасывает кэш произведений.'
+        )
+        assert response.json()['rating'] == 8
+        title.genre.add(Genre.objects.create(name='Драма', slug='drama'))
+        response, _ = get(client, url)
+        assert response.json()['genre'] == [
+            {'name': 'Драма', 'slug': 'drama'}
+        ], 'Проверьте, что изменение жанров сбрасывает кэш произведений.'
+
+        get(client, '/api/v1/categories/')
+        category.name = 'Кино'
+        category.save()
+        response, _ = get(client, '/api/v1/categories/')
+        assert response.json()['results'][0]['name'] == 'Кино'
+        response, _ = get(client, url)
+        assert response.json()['category']['name'] == 'Кино'
+
+    def test_01_locmem_cache(self, client, admin, user, settings,
+                             tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        self.check_cache(client, admin, user)
+
+    def test_02_file_cache(self, client, admin, user, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path / 'versions'
+        settings.CACHES = {
+            **settings.CACHES,
+            'responses-file': {
+                **settings.CACHES['responses-file'],
+                'LOCATION': tmp_path / 'responses',
+            },
+        }
+        settings.RESPONSE_CACHE_ALIAS = 'responses-file'
+        self.check_cache(client, admin, user)
+        assert any((tmp_path / 'responses').iterdir())
+
+    def test_03_authenticated_not_cached(self, user_client, settings,
+                                         tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        Genre.objects.create(name='Драма', slug='drama')
+        for _ in range(2):
+            response, queries = get(user_client, '/api/v1/genres/')
+            assert 'X-Cache' not in response and queries, (
+                'Проверьте, что запросы с токеном не кэшируются.'
+            )
+
+    def test_04_deleted_title_reviews(self, client, admin_client, settings,
+                                      tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        get(client, url)
+        response = admin_client.delete(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что после удаления произведения кэш не отдает '
+            'список его отзывов.'
+        )
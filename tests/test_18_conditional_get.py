@@ -0,0 +1,97 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18ConditionalGet:
+
+    def test_01_etag(self, client, user_client, user, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        category = Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(name='Сталкер', year=1979,
+                                     category=category)
+        review = Review.objects.create(title=title, author=user, text='.',
+                                       score=8)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        for url in ('/api/v1/titles/', f'/api/v1/titles/{title.id}/',
+                    '/api/v1/genres/', '/api/v1/categories/', reviews_url,
+                    comments_url):
+            for test_client in (client, user_client):
+                response = test_client.get(url)
+                assert response.status_code == HTTPStatus.OK
+                assert response.has_header('ETag') and response.has_header(
+                    'Last-Modified'
+                ), f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+                'заголовки `ETag` и `Last-Modified`.'
+                with CaptureQueriesContext(connection) as context:
+                    response = test_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                    f'Проверьте, что GET-запрос к `{url}` с совпадающим '
+                    '`If-None-Match` возвращает 304.'
+                )
+                assert not any(
+                    'reviews_' in query['sql']
+                    for query in context.captured_queries
+                ), f'Проверьте, что ответ 304 на `{url}` не выполняет '
+                'запросов к данным.'
+
+        response = user_client.get(reviews_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        Comment.objects.create(review=review, author=user, text='.')
+        response = user_client.get(reviews_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        response = user_client.get(
+            reviews_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что `If-Modified-Since` тоже возвращает 304.'
+        )
+        review.text = 'Новый текст'
+        review.save()
+        response = user_client.get(reviews_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение отзыва меняет `ETag` списка отзывов.'
+        )
+        assert response.json()['results'][0]['text'] == 'Новый текст'
+
+        user.username = 'renamed'
+        user.save()
+        response = user_client.get(
+            reviews_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что смена username автора меняет `ETag` отзывов.'
+        )
+        assert response.json()['results'][0]['author'] == 'renamed'
+
+    def test_02_deleted_parent(self, user_client, admin_client, user,
+                               settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        review = Review.objects.create(title=title, author=user, text='.',
+                                       score=8)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        etag = user_client.get(comments_url)['ETag']
+        review.delete()
+        response = user_client.get(comments_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что после удаления отзыва `If-None-Match` к списку '
+            'его комментариев возвращает 404, а не 304.'
+        )
+        etag = user_client.get(reviews_url)['ETag']
+        admin_client.delete(f'/api/v1/titles/{title.id}/')
+        response = user_client.get(reviews_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что после удаления произведения `If-None-Match` '
+            'к списку его отзывов возвращает 404, а не 304.'
+        )
@@ -0,0 +1,105 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test import Client, RequestFactory
+
+from api.cache import single_flight
+from api.views import ReviewViewSet, TitleViewSet
+from reviews.models import Category, Review, Title
+
+
+def get_in_thread(url):
+    try:
+        response = Client().get(url)
+        return response.status_code, response['X-Cache']
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19SingleFlight:
+
+    def test_01_concurrent_misses_coalesced(self, admin_client, monkeypatch,
+                                            settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Сталкер', year=1979,
+                                     category=category)
+        calls = []
+        retrieve = TitleViewSet.retrieve
+
+        def slow_retrieve(self, request, *args, **kwargs):
+            calls.append(1)
+            time.sleep(0.3)
+            return retrieve(self, request, *args, **kwargs)
+
+        monkeypatch.setattr(TitleViewSet, 'retrieve', slow_retrieve)
+        before = single_flight.stats().get('coalesced', 0)
+        url = f'/api/v1/titles/{title.id}/'
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(get_in_thread, [url] * 5))
+        assert all(status == HTTPStatus.OK for status, _ in results)
+        assert len(calls) == 1, (
+            'Проверьте, что одновременные запросы к `/api/v1/titles/{id}/` '
+            'при промахе кэша пересчитывает только один из них.'
+        )
+        assert sorted(state for _, state in results) == [
+            'COALESCED'] * 4 + ['MISS']
+        stats = admin_client.get('/api/v1/cache/stats/').json()
+        assert stats['coalesced'] - before == 4, (
+            'Проверьте, что `/api/v1/cache/stats/` считает объединенные '
+            'запросы.'
+        )
+
+    def test_02_stale_served_while_refreshing(self, client, user,
+                                              settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Сталкер', year=1979,
+                                     category=category)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        assert client.get(url)['X-Cache'] == 'MISS'
+        Review.objects.create(title=title, author=user, text='.', score=5)
+
+        # Другой запрос уже пересчитывает этот ответ.
+        key = ReviewViewSet().get_cache_key(RequestFactory().get(url))
+        assert single_flight.acquire(key)
+        before = single_flight.stats().get('stale_served', 0)
+        response = client.get(url)
+        assert response['X-Cache'] == 'STALE', (
+            'Проверьте, что пока ответ пересчитывается, остальные запросы '
+            'получают устаревшую запись из кэша.'
+        )
+        assert response.json()['results'] == []
+        assert single_flight.stats()['stale_served'] - before == 1
+
+        single_flight.release(key)
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert len(response.json()['results']) == 1
+
+    def test_03_stats_admin_only(self, user_client):
+        response = user_client.get('/api/v1/cache/stats/')
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+    def test_04_lock_file(self, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        assert single_flight.acquire('response:key')
+        assert not single_flight.acquire('response:key'), (
+            'Проверьте, что блокировку пересчета получает только '
+            'один запрос.'
+        )
+        assert single_flight.acquire('response:other')
+        expired = time.time() - single_flight.lock_timeout - 1
+        os.utime(single_flight.lock_path('response:key'),
+                 (expired, expired))
+        assert single_flight.acquire('response:key'), (
+            'Проверьте, что блокировка упавшего процесса снимается '
+            'по истечении lock_timeout.'
+        )
+        single_flight.release('response:key')
+        assert single_flight.acquire('response:key')
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+from django.db import OperationalError
+
+from api import cache
+from api.views import TitleViewSet
+from reviews.models import Title
+
+
+def wait_for(client, url, state, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get(url)
+        if response['X-Cache'] == state:
+            return response
+        time.sleep(0.05)
+    raise AssertionError(f'Ответ {state} не дождались за {timeout} с.')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20StaleResponses:
+    url = '/api/v1/titles/'
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, tmp_path, monkeypatch):
+        settings.VERSION_FILES_DIR = tmp_path
+        settings.STALE_REFRESH_TIMEOUT = 0.1
+        monkeypatch.setattr(cache, 'REFRESH_RETRY_DELAY', 0.01)
+        self.monkeypatch = monkeypatch
+
+    def test_01_locked_database(self, client):
+        Title.objects.create(name='Сталкер', year=1979)
+        assert client.get(self.url)['X-Cache'] == 'MISS'
+        Title.objects.create(name='Солярис', year=1972)
+        list_titles = TitleViewSet.list
+
+        def locked(self, request, *args, **kwargs):
+            raise OperationalError('database is locked')
+
+        self.monkeypatch.setattr(TitleViewSet, 'list', locked)
+        response = client.get(self.url)
+        assert response.status_code == 200, (
+            'Проверьте, что при заблокированной БД `/api/v1/titles/` '
+            'отдает последний закэшированный ответ, а не ошибку.'
+        )
+        assert response['X-Cache'] == 'STALE' and 'Age' in response
+        assert len(response.json()['results']) == 1
+
+        self.monkeypatch.setattr(TitleViewSet, 'list', list_titles)
+        response = wait_for(client, self.url, 'MISS')
+        assert len(response.json()['results']) == 2
+
+    def test_02_slow_database(self, client):
+        Title.objects.create(name='Сталкер', year=1979)
+        client.get(self.url)
+        Title.objects.create(name='Солярис', year=1972)
+        list_titles = TitleViewSet.list
+
+        def slow(self, request, *args, **kwargs):
+            time.sleep(0.5)
+            return list_titles(self, request, *args, **kwargs)
+
+        self.monkeypatch.setattr(TitleViewSet, 'list', slow)
+        started = time.monotonic()
+        response = client.get(self.url)
+        assert time.monotonic() - started < 0.4, (
+            'Проверьте, что медленный пересчет не задерживает ответ '
+            'дольше STALE_REFRESH_TIMEOUT.'
+        )
+        assert response['X-Cache'] == 'STALE'
+        response = wait_for(client, self.url, 'HIT')
+        assert len(response.json()['results']) == 2, (
+            'Проверьте, что фоновый пересчет сохраняет новый ответ в кэш.'
+        )
+
+    def test_03_max_stale_age(self, client, settings):
+        settings.MAX_STALE_AGE = {'titles': 0}
+        Title.objects.create(name='Сталкер', year=1979)
+        client.get(self.url)
+        Title.objects.create(name='Солярис', year=1972)
+
+        def locked(self, request, *args, **kwargs):
+            raise OperationalError('database is locked')
+
+        self.monkeypatch.setattr(TitleViewSet, 'list', locked)
+        with pytest.raises(OperationalError):
+            client.get(self.url)
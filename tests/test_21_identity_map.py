@@ -0,0 +1,54 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review, Title
+
+
+def count_loads(context, table):
+    # Индекс подсказок отдельно читает рейтинг произведения, он
+    # выбирает только rating и review_count, а не объект целиком.
+    return sum(
+        query['sql'].startswith(f'SELECT "{table}"."id", ')
+        for query in context.captured_queries
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21IdentityMap:
+
+    def test_01_parents_loaded_once(self, user_client, user, settings,
+                                    tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data={'text': '.', 'score': 7})
+        assert response.status_code == HTTPStatus.CREATED
+        assert count_loads(context, 'reviews_title') == 1, (
+            'Проверьте, что при создании отзыва произведение загружается '
+            'из БД один раз.'
+        )
+
+        review = Review.objects.get()
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.patch(
+                f'{url}{review.id}/', data={'text': 'Новый'}
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert count_loads(context, 'reviews_title') == 1
+        assert count_loads(context, 'users_user') == 1, (
+            'Проверьте, что проверка прав на отзыв не загружает автора '
+            'повторно, если это текущий пользователь.'
+        )
+
+        url = f'{url}{review.id}/comments/'
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data={'text': '.'})
+        assert response.status_code == HTTPStatus.CREATED
+        assert count_loads(context, 'reviews_review') == 1, (
+            'Проверьте, что при создании комментария отзыв загружается '
+            'из БД один раз.'
+        )
@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22NestedComments:
+
+    def test_01_comments_match_title(self, client, user_client, user,
+                                     settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        other_title = Title.objects.create(name='Солярис', year=1972)
+        review = Review.objects.create(title=title, author=user, text='.',
+                                       score=7)
+        empty_review = Review.objects.create(title=other_title, author=user,
+                                             text='.', score=5)
+        comment = Comment.objects.create(review=review, author=user,
+                                         text='.')
+
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert [item['id'] for item in response.json()['results']] == [
+            comment.id
+        ]
+        sqls = [query['sql'] for query in context.captured_queries]
+        assert not any(
+            sql.startswith('SELECT "reviews_review"') for sql in sqls
+        ) and not any(sql.startswith('SELECT "reviews_title"')
+                      for sql in sqls), (
+            'Проверьте, что список комментариев не загружает отдельно '
+            'отзыв и произведение, а фильтрует комментарии по обоим '
+            'параметрам URL в одном запросе.'
+        )
+
+        for url in (
+            f'/api/v1/titles/{other_title.id}/reviews/{review.id}/comments/',
+            f'/api/v1/titles/{other_title.id}/reviews/{review.id}/'
+            f'comments/{comment.id}/',
+            f'/api/v1/titles/{title.id}/reviews/100500/comments/',
+        ):
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что комментарии к отзыву, который не относится '
+                'к произведению из URL, возвращают 404.'
+            )
+
+        response = client.get(
+            f'/api/v1/titles/{other_title.id}/reviews/{empty_review.id}/'
+            'comments/'
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['results'] == []
+        response = user_client.post(
+            f'/api/v1/titles/{other_title.id}/reviews/{review.id}/comments/',
+            data={'text': '.'}
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert Comment.objects.count() == 1
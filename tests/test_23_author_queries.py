@@ -0,0 +1,81 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+User = get_user_model()
+
+
+def get_counting_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    return response, context.captured_queries
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23AuthorQueries:
+
+    def test_01_lists_load_authors_in_one_query(self, client, settings,
+                                                tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        authors = [
+            User.objects.create(username=f'author{idx}',
+                                email=f'author{idx}@yamdb.fake')
+            for idx in range(6)
+        ]
+        reviews = [
+            Review.objects.create(title=title, author=author, text='.',
+                                  score=5)
+            for author in authors
+        ]
+        for author in authors:
+            Comment.objects.create(review=reviews[0], author=author,
+                                   text='.')
+
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        response, queries = get_counting_queries(client, url)
+        assert {review['author'] for review in response.json()['results']}
+        assert len(queries) <= 2, (
+            'Проверьте, что список отзывов загружает авторов тем же '
+            'запросом, что и отзывы.'
+        )
+        assert 'users_user"."email' not in queries[-1]['sql'], (
+            'Проверьте, что из полей автора загружается только username.'
+        )
+        response, queries = get_counting_queries(
+            client, f'{url}{reviews[0].id}/comments/'
+        )
+        assert response.json()['results'][0]['author'] == 'author5'
+        assert len(queries) == 1, (
+            'Проверьте, что список комментариев загружает авторов тем же '
+            'запросом, что и комментарии.'
+        )
+
+    def test_02_permission_compares_author_id(self, moderator_client,
+                                              user, settings, tmp_path):
+        settings.VERSION_FILES_DIR = tmp_path
+        title = Title.objects.create(name='Сталкер', year=1979)
+        review = Review.objects.create(title=title, author=user, text='.',
+                                       score=5)
+        with CaptureQueriesContext(connection) as context:
+            response = moderator_client.patch(
+                f'/api/v1/titles/{title.id}/reviews/{review.id}/',
+                data={'text': 'Исправлено модератором'}
+            )
+        assert response.status_code == HTTPStatus.OK
+        user_loads = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT "users_user"."id", '
+                                       '"users_user"."password"')
+        ]
+        assert len(user_loads) == 1, (
+            'Проверьте, что проверка прав на отзыв сравнивает author_id и '
+            'не загружает автора целиком.'
+        )
+        assert response.json()['author'] == user.username
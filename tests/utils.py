@@ -129,6 +129,27 @@ def check_pagination(url, respons_data, expected_count, post_data=None):
         )
 
 
+def check_cursor_pagination(url, respons_data, expected_count):
+    expected_keys = ('next', 'previous', 'results')
+    for key in expected_keys:
+        assert key in respons_data, (
+            f'Проверьте, что для эндпоинта `{url}` настроена '
+            f'пагинация курсором и ответ на GET-запрос содержит ключ {key}.'
+        )
+    assert 'count' not in respons_data, (
+        f'Проверьте, что для эндпоинта `{url}` настроена пагинация '
+        'курсором: ответ не должен содержать ключ `count`.'
+    )
+    assert isinstance(respons_data['results'], list), (
+        f'Проверьте, что для эндпоинта `{url}` настроена '
+        'пагинация. Значением ключа `results` должен быть список.'
+    )
+    assert len(respons_data['results']) == expected_count, (
+        f'Проверьте, что для эндпоинта `{url}` настроена пагинация. Сейчас '
+        'ключ `results` содержит некорректное количество элементов.'
+    )
+
+
 def check_permissions(client, url, data, user_role, objects,
                       expected_status):
     sufix = 'slug' if 'slug' in objects[0] else 'id'